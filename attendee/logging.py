@@ -1,17 +1,44 @@
+import math
 from datetime import datetime, timezone
 
-from pythonjsonlogger import jsonlogger
+from pythonjsonlogger.orjson import OrjsonFormatter
 
 
-class ISOJsonFormatter(jsonlogger.JsonFormatter):
+class ISOJsonFormatter(OrjsonFormatter):
     """
     JSON formatter that adds ISO 8601 timestamp
+    Serializes with orjson, which is several times faster than the stdlib json encoder.
     """
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (whole second, ISO string for that second), so we only build a datetime once per second
+        self._iso_second_cache = (None, None)
+
+    def _iso_timestamp(self, created):
+        # Split the timestamp the same way datetime.fromtimestamp does, so the output is identical to dt.isoformat()
+        fraction, whole_seconds = math.modf(created)
+        microseconds = round(fraction * 1e6)
+        if microseconds >= 1000000:
+            whole_seconds += 1
+            microseconds -= 1000000
+        elif microseconds < 0:
+            whole_seconds -= 1
+            microseconds += 1000000
+        whole_seconds = int(whole_seconds)
+
+        cached_second, cached_iso_second = self._iso_second_cache
+        if cached_second != whole_seconds:
+            cached_iso_second = datetime.fromtimestamp(whole_seconds, tz=timezone.utc).replace(tzinfo=None).isoformat()
+            self._iso_second_cache = (whole_seconds, cached_iso_second)
+
+        if microseconds:
+            return f"{cached_iso_second}.{microseconds:06d}+00:00"
+        return f"{cached_iso_second}+00:00"
+
     def add_fields(self, log_record, record, message_dict):
         super().add_fields(log_record, record, message_dict)
 
         # Add ISO timestamp from the record's created time
         # record.created is a Unix timestamp (float)
-        dt = datetime.fromtimestamp(record.created, tz=timezone.utc)
-        log_record["timestamp"] = dt.isoformat()
+        log_record["timestamp"] = self._iso_timestamp(record.created)
@@ -535,6 +535,7 @@ class BotController:
             BotEventManager.create_event(bot=self.bot_in_db, event_type=BotEventTypes.POST_PROCESSING_COMPLETED)
 
         normal_quitting_process_worked = True
+        self.ended_event.set()
 
     # We're going to wait until all utterances are transcribed or have failed. If there are still
     # in progress utterances, after 5 minutes, then we'll consider them failed and mark them as timed out.
@@ -559,6 +560,8 @@ class BotController:
         self.bot_in_db = Bot.objects.get(id=bot_id)
         self.cleanup_called = False
         self.run_called = False
+        # Set once cleanup has finished or the main loop has exited, so callers can wait for the bot to end without polling
+        self.ended_event = threading.Event()
 
         self.redis_client = None
         self.pubsub = None
@@ -815,6 +818,10 @@ class BotController:
             logger.info(f"Error in bot {self.bot_in_db.id}: {str(e)}")
             self.cleanup()
         finally:
+            # The main loop has exited, so the bot is done even if cleanup raised part way through. Set this before
+            # touching Redis, so callers waiting for the bot to end aren't left hanging if that fails too.
+            self.ended_event.set()
+
             # Clean up Redis subscription
             self.pubsub.unsubscribe(self.pubsub_channel)
             self.pubsub.close()
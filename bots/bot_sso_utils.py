@@ -79,6 +79,9 @@ def get_bot_login_for_google_meet_sign_in_session(session_id):
 
 IDP_ENTITY_ID = "https://idp.attendee.local"  # Your IdP entityID (can be any stable URL you control)
 IDP_SSO_URL = "https://idp.attendee.local/sso"  # Dummy SSO endpoint to satisfy pysaml2 config
+# pysaml2's default crypto backend signs by running this binary, so canonicalization and RSA-SHA256
+# already happen in libxmlsec1/OpenSSL rather than in Python. The keys belong to individual
+# GoogleMeetBotLogins, so there is no single process-wide key to preload.
 XMLSEC_BINARY = "/usr/bin/xmlsec1"  # adjust if different in your environment
 
 # XML namespaces for parsing the AuthnRequest
@@ -179,6 +182,8 @@ def _build_idp_server(sp_entity_id: str, acs_url: str, cert_file: str, key_file:
 
 def _html_auto_post_form(action_url: str, saml_response_b64: str, relay_state: str | None) -> str:
     """Return a minimal HTML page that auto-POSTs SAMLResponse (+ RelayState if present) to the ACS."""
+    # The ACS URL comes from the AuthnRequest, so escape it like RelayState. The SAMLResponse is base64 and needs no escaping.
+    action_url = html.escape(action_url, quote=True)
     rs_input = f'<input type="hidden" name="RelayState" value="{html.escape(str(relay_state), quote=True)}"/>' if relay_state is not None else ""
     return f"""<!DOCTYPE html>
 <html>
@@ -3,19 +3,24 @@ import logging
 import os
 from datetime import timedelta
 
+import orjson
 import stripe
+from django.db.models import Q
 from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
-from .models import ZoomOAuthApp, ZoomOAuthConnection
+from .models import ZoomOAuthApp
 from .stripe_utils import process_checkout_session_completed, process_customer_updated, process_payment_intent_succeeded
-from .zoom_oauth_connections_utils import _upsert_zoom_meeting_to_zoom_oauth_connection_mapping, _verify_zoom_webhook_signature, compute_zoom_webhook_validation_response
+from .zoom_oauth_connections_utils import _upsert_zoom_meeting_to_zoom_oauth_connection_mapping, _verify_zoom_webhook_signature, compute_zoom_webhook_validation_response, get_cached_zoom_oauth_app, get_cached_zoom_oauth_connection
 
 logger = logging.getLogger(__name__)
 
+# Read once at import rather than on every Stripe webhook
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+
 
 @method_decorator(csrf_exempt, name="dispatch")
 class ExternalWebhookZoomOAuthAppView(View):
@@ -24,80 +29,62 @@ class ExternalWebhookZoomOAuthAppView(View):
     This endpoint is called by Zoom when events occur (oauth app created, etc.)
     """
 
+    # Maps Zoom event types to the handler method for that event. A handler returns an
+    # HttpResponse to end processing early, or None to fall through to the common bookkeeping.
+    _EVENT_HANDLERS = {
+        "meeting.created": "_handle_meeting_created",
+        "user.updated": "_handle_user_updated",
+    }
+
     def post(self, request, object_id):
-        request_body = request.body.decode("utf-8")
-        signature_header = request.META.get("HTTP_X_ZM_SIGNATURE")
-        timestamp_header = request.META.get("HTTP_X_ZM_REQUEST_TIMESTAMP")
+        request_body = request.body
+        signature_header = request.headers.get("X-Zm-Signature")
+        timestamp_header = request.headers.get("X-Zm-Request-Timestamp")
 
-        logger.info(f"Received Zoom OAuth app webhook event: {request_body}")
+        # Only log the (possibly large) body when debugging. The structured log below is enough otherwise.
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Zoom OAuth app webhook event body: {request_body}")
 
         try:
-            zoom_oauth_app = ZoomOAuthApp.objects.get(object_id=object_id)
+            zoom_oauth_app = get_cached_zoom_oauth_app(object_id)
+            # Decrypting the credentials isn't free, so only do it once per request
+            webhook_secret = zoom_oauth_app.webhook_secret
             if not _verify_zoom_webhook_signature(
                 body=request_body,
                 timestamp=timestamp_header,
                 signature=signature_header,
-                secret=zoom_oauth_app.webhook_secret,
+                secret=webhook_secret,
             ):
                 logger.error(f"Invalid Zoom webhook signature for webhook for zoom oauth app {zoom_oauth_app.object_id}")
-                # Only update if it was more than 5 minutes ago to prevent excessive updates
-                if not zoom_oauth_app.last_unverified_webhook_received_at or zoom_oauth_app.last_unverified_webhook_received_at < timezone.now() - timedelta(minutes=5):
-                    zoom_oauth_app.last_unverified_webhook_received_at = timezone.now()
-                    zoom_oauth_app.save()
+                # Only update if it was more than 5 minutes ago to prevent excessive updates. The check is part of the UPDATE, so concurrent webhooks don't all write.
+                now = timezone.now()
+                ZoomOAuthApp.objects.filter(Q(last_unverified_webhook_received_at__isnull=True) | Q(last_unverified_webhook_received_at__lt=now - timedelta(minutes=5)), pk=zoom_oauth_app.pk).update(last_unverified_webhook_received_at=now)
                 return HttpResponse(status=400)
 
-            event_json = json.loads(request_body)
+            try:
+                event_json = orjson.loads(request_body)
+            except orjson.JSONDecodeError:
+                # orjson is stricter than the stdlib parser (e.g. NaN, integers wider than 64 bits)
+                event_json = json.loads(request_body)
             event_type = event_json.get("event")
-            if event_type == "meeting.created":
-                meeting_id = event_json.get("payload", {}).get("object", {}).get("id")
-                # Host is the user who is hosting the meeting
-                host_id = event_json.get("payload", {}).get("object", {}).get("host_id")
-                # Operator is the user who created the meeting
-                operator_id = event_json.get("payload", {}).get("operator_id")
-                # Just logging this to see if it ever happens
-                if operator_id != host_id:
-                    logger.info(f"Operator ID does not match Host ID. {operator_id} != {host_id}. This doesn't affect anything, but just logging it.")
-
-                zoom_oauth_connection = ZoomOAuthConnection.objects.filter(zoom_oauth_app=zoom_oauth_app, user_id=operator_id).first()
-                if not zoom_oauth_connection:
-                    logger.info(f"No Zoom OAuth connection found for operator ID {operator_id}")
-                    return HttpResponse(status=200)
-
-                _upsert_zoom_meeting_to_zoom_oauth_connection_mapping([str(meeting_id)], zoom_oauth_connection)
-
-            if event_type == "user.updated":
-                new_object = event_json.get("payload", {}).get("object")
-                old_object = event_json.get("payload", {}).get("old_object")
-                if new_object.get("pmi") == old_object.get("pmi"):
-                    logger.info(f"PMID did not change. {new_object.get('pmi')} == {old_object.get('pmi')}. So not doing anything.")
-                    return HttpResponse(status=200)
-
-                if new_object.get("pmi") is None:
-                    logger.info("New PMI is None. So not doing anything.")
-                    return HttpResponse(status=200)
-
-                if new_object.get("id") is None:
-                    logger.info("New user ID is None. So not doing anything.")
-                    return HttpResponse(status=200)
-
-                zoom_oauth_connection = ZoomOAuthConnection.objects.filter(zoom_oauth_app=zoom_oauth_app, user_id=new_object.get("id")).first()
-                if not zoom_oauth_connection:
-                    logger.info(f"No Zoom OAuth connection found for user ID {new_object.get('id')}")
-                    return HttpResponse(status=200)
-
-                _upsert_zoom_meeting_to_zoom_oauth_connection_mapping([str(new_object.get("pmi"))], zoom_oauth_connection)
-
-            # Only update if it was more than 5 minutes ago to prevent excessive updates
-            if not zoom_oauth_app.last_verified_webhook_received_at or zoom_oauth_app.last_verified_webhook_received_at < timezone.now() - timedelta(minutes=5):
-                zoom_oauth_app.last_verified_webhook_received_at = timezone.now()
-                zoom_oauth_app.save()
-
-            # Handle endpoint.url_validation event type
+            logger.info("Received Zoom OAuth app webhook event", extra={"event_type": event_type, "zoom_oauth_app_object_id": object_id, "body_len": len(request_body)})
+            payload = event_json.get("payload") or {}
+
+            # Zoom times out endpoint validation quickly, so build the response before doing anything else
             if event_type == "endpoint.url_validation":
-                json_response = compute_zoom_webhook_validation_response(event_json.get("payload", {}).get("plainToken"), zoom_oauth_app.webhook_secret)
+                json_response = compute_zoom_webhook_validation_response(payload.get("plainToken"), webhook_secret)
                 logger.info(f"Received Zoom OAuth app webhook event for endpoint URL validation: {event_json}. Returning JSON response: {json_response}")
+                self._record_verified_webhook_received(zoom_oauth_app)
                 return JsonResponse(json_response, status=200)
 
+            handler_name = self._EVENT_HANDLERS.get(event_type)
+            if handler_name:
+                handler_response = getattr(self, handler_name)(zoom_oauth_app, payload)
+                if handler_response is not None:
+                    return handler_response
+
+            self._record_verified_webhook_received(zoom_oauth_app)
+
         except ZoomOAuthApp.DoesNotExist:
             logger.error("Zoom OAuth app does not exist")
             return HttpResponse(status=400)
@@ -106,6 +93,56 @@ class ExternalWebhookZoomOAuthAppView(View):
             return HttpResponse(status=400)
         return HttpResponse(status=200)
 
+    def _record_verified_webhook_received(self, zoom_oauth_app):
+        # Only update if it was more than 5 minutes ago to prevent excessive updates. The check is part of the UPDATE, so concurrent webhooks don't all write.
+        now = timezone.now()
+        ZoomOAuthApp.objects.filter(Q(last_verified_webhook_received_at__isnull=True) | Q(last_verified_webhook_received_at__lt=now - timedelta(minutes=5)), pk=zoom_oauth_app.pk).update(last_verified_webhook_received_at=now)
+
+    def _handle_meeting_created(self, zoom_oauth_app, payload):
+        meeting_object = payload.get("object") or {}
+        meeting_id = meeting_object.get("id")
+        # Host is the user who is hosting the meeting
+        host_id = meeting_object.get("host_id")
+        # Operator is the user who created the meeting
+        operator_id = payload.get("operator_id")
+        # Just logging this to see if it ever happens
+        if operator_id != host_id:
+            logger.info(f"Operator ID does not match Host ID. {operator_id} != {host_id}. This doesn't affect anything, but just logging it.")
+
+        zoom_oauth_connection = get_cached_zoom_oauth_connection(zoom_oauth_app, operator_id)
+        if not zoom_oauth_connection:
+            logger.info(f"No Zoom OAuth connection found for operator ID {operator_id}")
+            return HttpResponse(status=200)
+
+        _upsert_zoom_meeting_to_zoom_oauth_connection_mapping([str(meeting_id)], zoom_oauth_connection)
+        return None
+
+    def _handle_user_updated(self, zoom_oauth_app, payload):
+        new_object = payload.get("object") or {}
+        old_object = payload.get("old_object") or {}
+        new_pmi = new_object.get("pmi")
+        old_pmi = old_object.get("pmi")
+        if new_pmi == old_pmi:
+            logger.info(f"PMID did not change. {new_pmi} == {old_pmi}. So not doing anything.")
+            return HttpResponse(status=200)
+
+        if new_pmi is None:
+            logger.info("New PMI is None. So not doing anything.")
+            return HttpResponse(status=200)
+
+        new_user_id = new_object.get("id")
+        if new_user_id is None:
+            logger.info("New user ID is None. So not doing anything.")
+            return HttpResponse(status=200)
+
+        zoom_oauth_connection = get_cached_zoom_oauth_connection(zoom_oauth_app, new_user_id)
+        if not zoom_oauth_connection:
+            logger.info(f"No Zoom OAuth connection found for user ID {new_user_id}")
+            return HttpResponse(status=200)
+
+        _upsert_zoom_meeting_to_zoom_oauth_connection_mapping([str(new_pmi)], zoom_oauth_connection)
+        return None
+
 
 @method_decorator(csrf_exempt, name="dispatch")
 class ExternalWebhookStripeView(View):
@@ -114,9 +151,17 @@ class ExternalWebhookStripeView(View):
     This endpoint is called by Stripe when events occur (payments, refunds, etc.)
     """
 
+    # Maps Stripe event types to the handler method for that event. Each handler is passed the event's data.
+    _EVENT_HANDLERS = {
+        "checkout.session.completed": "_handle_checkout_session_completed",
+        "payment_intent.succeeded": "_handle_payment_intent_succeeded",
+        "customer.updated": "_handle_customer_updated",
+    }
+
     def post(self, request, *args, **kwargs):
+        # Stripe verifies the signature over the raw bytes, so pass them through without decoding
         payload = request.body
-        sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
+        sig_header = request.headers.get("Stripe-Signature")
 
         if not sig_header:
             logger.error("Stripe signature header is missing")
@@ -124,24 +169,15 @@ class ExternalWebhookStripeView(View):
 
         try:
             # Verify the webhook signature
-            event = stripe.Webhook.construct_event(payload, sig_header, os.getenv("STRIPE_WEBHOOK_SECRET"))
+            event = stripe.Webhook.construct_event(payload, sig_header, STRIPE_WEBHOOK_SECRET)
 
-            # Handle different event types
             event_type = event["type"]
-            event_data = event["data"]["object"]
 
             logger.info(f"Received Stripe webhook event: {event_type}")
 
-            if event_type == "checkout.session.completed":
-                # Payment was successful
-                self._handle_checkout_session_completed(event_data)
-            elif event_type == "payment_intent.succeeded":
-                # Payment was successful
-                self._handle_payment_intent_succeeded(event_data)
-            elif event_type == "customer.updated":
-                # Customer updated
-                event_previous_attributes = event["data"].get("previous_attributes")
-                self._handle_customer_updated(event_data, event_previous_attributes)
+            handler_name = self._EVENT_HANDLERS.get(event_type)
+            if handler_name:
+                getattr(self, handler_name)(event["data"])
             else:
                 logger.info(f"Received Stripe webhook event that we don't handle: {event_type}")
 
@@ -160,17 +196,22 @@ class ExternalWebhookStripeView(View):
             logger.error(f"Error processing Stripe webhook: {str(e)}")
             return HttpResponse(status=400)
 
-    def _handle_checkout_session_completed(self, session):
-        logger.info(f"Received Stripe webhook event for checkout session completed: {session}")
+    def _handle_checkout_session_completed(self, event_data):
+        # Payment was successful
+        session = event_data["object"]
+        logger.info(f"Received Stripe webhook event for checkout session completed: {session.id}")
 
         process_checkout_session_completed(session)
 
-    def _handle_payment_intent_succeeded(self, payment_intent):
-        logger.info(f"Received Stripe webhook event for payment intent succeeded: {payment_intent}")
+    def _handle_payment_intent_succeeded(self, event_data):
+        # Payment was successful
+        payment_intent = event_data["object"]
+        logger.info(f"Received Stripe webhook event for payment intent succeeded: {payment_intent.id}")
 
         process_payment_intent_succeeded(payment_intent)
 
-    def _handle_customer_updated(self, customer, customer_previous_attributes):
-        logger.info(f"Received Stripe webhook event for customer updated: {customer}")
+    def _handle_customer_updated(self, event_data):
+        customer = event_data["object"]
+        logger.info(f"Received Stripe webhook event for customer updated: {customer.id}")
 
-        process_customer_updated(customer, customer_previous_attributes)
+        process_customer_updated(customer, event_data.get("previous_attributes"))
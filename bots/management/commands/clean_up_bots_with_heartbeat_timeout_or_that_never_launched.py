@@ -89,9 +89,10 @@ class Command(BaseCommand):
         logger.info("Terminating bots that never launched...")
 
         try:
-            # Calculate timestamps for 7 days ago and 1 hour ago
-            seven_days_ago = timezone.now() - timezone.timedelta(days=7)
-            one_hour_ago = timezone.now() - timezone.timedelta(hours=1)
+            # Calculate timestamps for 7 days ago and 1 hour ago, from the same now so the window is exactly what it says
+            now = timezone.now()
+            seven_days_ago = now - timezone.timedelta(days=7)
+            one_hour_ago = now - timezone.timedelta(hours=1)
 
             # Find non-post-meeting bots where:
             # - created between 7 days and 1 hour ago AND join_at is null OR join_at is between 7 days and 1 hour ago
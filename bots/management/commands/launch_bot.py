@@ -2,6 +2,7 @@ import json
 import logging
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
 from bots.models import (
     Bot,
@@ -29,6 +30,8 @@ class Command(BaseCommand):
         parser.add_argument("--websocket_settings", type=str, help="Websocket Settings", default="null")
         parser.add_argument("--botname", type=str, help="Bot Name", required=True)
         parser.add_argument("--projectid", type=str, help="Project ID", required=True)
+        parser.add_argument("--async", action="store_true", dest="run_async", help="Run the task on a celery worker instead of in this process")
+        parser.add_argument("--timeout", type=float, help="Seconds to wait for the task when using --async", default=None)
 
     def handle(self, *args, **options):
         logger.info("Running task...")
@@ -46,25 +49,31 @@ class Command(BaseCommand):
             "websocket_settings": websocket_settings,
         }
 
-        bot = Bot.objects.create(
-            project=project,
-            meeting_url=meeting_url,
-            name=bot_name,
-            settings=settings,
-        )
+        # Create the bot, its recording and the initial event in one transaction, so they are committed together
+        with transaction.atomic():
+            bot = Bot.objects.create(
+                project=project,
+                meeting_url=meeting_url,
+                name=bot_name,
+                settings=settings,
+            )
 
-        Recording.objects.create(
-            bot=bot,
-            recording_type=RecordingTypes.AUDIO_AND_VIDEO,
-            transcription_type=TranscriptionTypes.NON_REALTIME,
-            transcription_provider=TranscriptionProviders.DEEPGRAM,
-            is_default_recording=True,
-        )
+            Recording.objects.create(
+                bot=bot,
+                recording_type=RecordingTypes.AUDIO_AND_VIDEO,
+                transcription_type=TranscriptionTypes.NON_REALTIME,
+                transcription_provider=TranscriptionProviders.DEEPGRAM,
+                is_default_recording=True,
+            )
 
-        # Try to transition the state from READY to JOINING
-        BotEventManager.create_event(bot, BotEventTypes.JOIN_REQUESTED)
+            # Try to transition the state from READY to JOINING
+            BotEventManager.create_event(bot, BotEventTypes.JOIN_REQUESTED)
 
-        # Call your task directly
-        result = run_bot.run(bot.id)
+        if options["run_async"]:
+            # Hand the task to the worker pool and wait for it to finish
+            result = run_bot.delay(bot.id).get(timeout=options["timeout"])
+        else:
+            # Call your task directly, so a debugger can be attached to this process
+            result = run_bot.run(bot.id)
 
         logger.info(f"Task completed with result: {result}")
@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ZoomOAuthApp, ZoomOAuthConnection
+from .zoom_oauth_connections_utils import invalidate_cached_zoom_oauth_app, invalidate_cached_zoom_oauth_connection
+
+
+# Drop the cache entries only once the change has committed. Otherwise a webhook arriving before the commit
+# could miss the cache, read the old row and put it straight back.
+@receiver(post_save, sender=ZoomOAuthApp)
+@receiver(post_delete, sender=ZoomOAuthApp)
+def invalidate_zoom_oauth_app_cache_on_change(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_cached_zoom_oauth_app(instance))
+
+
+@receiver(post_save, sender=ZoomOAuthConnection)
+@receiver(post_delete, sender=ZoomOAuthConnection)
+def invalidate_zoom_oauth_connection_cache_on_change(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_cached_zoom_oauth_connection(instance))
@@ -1,8 +1,15 @@
+import functools
 import os
+import struct
+import threading
 import time
-from unittest.mock import MagicMock
+from unittest.mock import Mock, call
 
-import numpy as np
+from pyvirtualdisplay import Display
+from selenium import webdriver
+
+from bots.bot_adapter import BotAdapter
+from bots.models import BotEventTypes, BotStates
 
 
 class MockVideoFrame:
@@ -91,57 +98,74 @@ class MockF32AudioFrame:
 
 # Simulate video data arrival
 # Create a mock video message in the format expected by process_video_frame
+# The frame is the same every time for a given size, so build it once. It's returned as bytes so callers can't alter the cached copy.
+@functools.lru_cache(maxsize=4)
 def create_mock_video_frame(width=640, height=480):
-    # Create a bytearray for the message
-    mock_video_message = bytearray()
-
-    # Add message type (2 for VIDEO) as first 4 bytes
-    mock_video_message.extend((2).to_bytes(4, byteorder="little"))
-
-    # Add timestamp (12345) as next 8 bytes
-    mock_video_message.extend((12345).to_bytes(8, byteorder="little"))
-
-    # Add stream ID length (4) and stream ID ("main") - total 8 bytes
-    stream_id = "main"
-    mock_video_message.extend(len(stream_id).to_bytes(4, byteorder="little"))
-    mock_video_message.extend(stream_id.encode("utf-8"))
-
-    # Add width and height - 8 bytes
-    mock_video_message.extend(width.to_bytes(4, byteorder="little"))
-    mock_video_message.extend(height.to_bytes(4, byteorder="little"))
+    # Header, all little-endian: message type (2 for VIDEO) in 4 bytes, timestamp (12345) in 8 bytes,
+    # stream ID length (4) in 4 bytes followed by the stream ID ("main"), then width and height in 4 bytes each
+    stream_id = b"main"
+    mock_video_message = bytearray(struct.pack("<IQI4sII", 2, 12345, len(stream_id), stream_id, width, height))
 
     # Create I420 frame data (Y, U, V planes)
     # Y plane: width * height bytes
     y_plane_size = width * height
-    y_plane = np.ones(y_plane_size, dtype=np.uint8) * 128  # mid-gray
+    y_plane = b"\x80" * y_plane_size  # mid-gray
 
     # U and V planes: (width//2 * height//2) bytes each
     uv_width = (width + 1) // 2  # half_ceil implementation
     uv_height = (height + 1) // 2
     uv_plane_size = uv_width * uv_height
 
-    u_plane = np.ones(uv_plane_size, dtype=np.uint8) * 128  # no color tint
-    v_plane = np.ones(uv_plane_size, dtype=np.uint8) * 128  # no color tint
+    u_plane = b"\x80" * uv_plane_size  # no color tint
+    v_plane = b"\x80" * uv_plane_size  # no color tint
 
     # Add the frame data to the message
-    mock_video_message.extend(y_plane.tobytes())
-    mock_video_message.extend(u_plane.tobytes())
-    mock_video_message.extend(v_plane.tobytes())
+    mock_video_message.extend(y_plane)
+    mock_video_message.extend(u_plane)
+    mock_video_message.extend(v_plane)
+
+    return bytes(mock_video_message)
+
+
+class FakeFileUploader:
+    """Stand-in for the file uploaders. Only the methods the bot controller calls are tracked, so there's no tree of child mocks."""
 
-    return mock_video_message
+    __slots__ = ("upload_file", "wait_for_upload", "delete_file", "filename")
+
+    def __init__(self):
+        self.upload_file = Mock(return_value=None)
+        self.wait_for_upload = Mock(return_value=None)
+        self.delete_file = Mock(return_value=None)
+        self.filename = "test-recording-key"
 
 
 def create_mock_file_uploader():
-    mock_file_uploader = MagicMock()
-    mock_file_uploader.upload_file.return_value = None
-    mock_file_uploader.wait_for_upload.return_value = None
-    mock_file_uploader.delete_file.return_value = None
-    mock_file_uploader.filename = "test-recording-key"
-    return mock_file_uploader
+    return FakeFileUploader()
+
+
+# Minimal valid PNG file (a single 1x1 pixel)
+MINIMAL_PNG_BYTES = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\nIDATx\x9cc\x00\x01\x00\x00\x05\x00\x01\r\n-\xb4\x00\x00\x00\x00IEND\xaeB`\x82"
+
+
+# (event_type, old_state, new_state) of the events for a bot that joins, records and then leaves
+EXPECTED_BOT_EVENTS = (
+    (BotEventTypes.JOIN_REQUESTED, BotStates.READY, BotStates.JOINING),
+    (BotEventTypes.BOT_JOINED_MEETING, BotStates.JOINING, BotStates.JOINED_NOT_RECORDING),
+    (BotEventTypes.BOT_RECORDING_PERMISSION_GRANTED, BotStates.JOINED_NOT_RECORDING, BotStates.JOINED_RECORDING),
+    (BotEventTypes.LEAVE_REQUESTED, BotStates.JOINED_RECORDING, BotStates.LEAVING),
+    (BotEventTypes.BOT_LEFT_MEETING, BotStates.LEAVING, BotStates.POST_PROCESSING),
+    (BotEventTypes.POST_PROCESSING_COMPLETED, BotStates.POST_PROCESSING, BotStates.ENDED),
+)
+
+
+# The scripts a Google Meet bot runs on the driver once it has joined, matching the side effects set up in create_mock_google_meet_driver
+EXPECTED_POST_JOIN_EXECUTE_SCRIPT_CALLS = [call("window.ws?.enableMediaSending();"), call("return performance.timeOrigin;")]
 
 
 def create_mock_google_meet_driver():
-    mock_driver = MagicMock()
+    # Specced so that only real Chrome driver attributes exist. service is set in Chrome's __init__, so it isn't part of the spec.
+    mock_driver = Mock(spec=webdriver.Chrome)
+    mock_driver.service = Mock()
     mock_driver.execute_script.side_effect = [
         None,  # First call (window.ws.enableMediaSending())
         12345,  # Second call (performance.timeOrigin)
@@ -153,8 +177,7 @@ def create_mock_google_meet_driver():
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         # Create empty file
         with open(filepath, "wb") as f:
-            # Write minimal valid PNG file bytes
-            f.write(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\nIDATx\x9cc\x00\x01\x00\x00\x05\x00\x01\r\n-\xb4\x00\x00\x00\x00IEND\xaeB`\x82")
+            f.write(MINIMAL_PNG_BYTES)
         return filepath
 
     mock_driver.save_screenshot.side_effect = mock_save_screenshot
@@ -162,6 +185,24 @@ def create_mock_google_meet_driver():
 
 
 def create_mock_display():
-    mock_display = MagicMock()
-    mock_display.new_display_var = ":99"
-    return mock_display
+    # Specced so that only real Display attributes exist, instead of a MagicMock that invents one on every access
+    return Mock(spec=Display, new_display_var=":99")
+
+
+def track_handled_adapter_messages(controller):
+    """
+    Wrap the controller's handler for messages from the adapter, so a test can wait until a message has been handled
+    (e.g. the bot is recording once BOT_RECORDING_PERMISSION_GRANTED has been handled) instead of sleeping.
+    Returns a dict of threading.Events keyed by adapter message. Must be called before the controller is run.
+    """
+    handled_messages = {message: threading.Event() for name, message in vars(BotAdapter.Messages).items() if not name.startswith("_")}
+    original_take_action_based_on_message_from_adapter = controller.take_action_based_on_message_from_adapter
+
+    def take_action_based_on_message_from_adapter(message):
+        result = original_take_action_based_on_message_from_adapter(message)
+        if message.get("message") in handled_messages:
+            handled_messages[message.get("message")].set()
+        return result
+
+    controller.take_action_based_on_message_from_adapter = take_action_based_on_message_from_adapter
+    return handled_messages
@@ -0,0 +1,244 @@
+import os
+from unittest.mock import MagicMock, patch
+
+import kubernetes
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from bots.management.commands.clean_up_bots_with_heartbeat_timeout_or_that_never_launched import Command
+from bots.models import (
+    Bot,
+    BotEventManager,
+    BotEventSubTypes,
+    BotEventTypes,
+    BotStates,
+    Organization,
+    Project,
+    Recording,
+    RecordingTypes,
+    TranscriptionProviders,
+    TranscriptionTypes,
+)
+
+
+# The cleanup command runs on the test thread, so unlike the bot tests, these can use TestCase and roll back
+# a transaction after each test instead of flushing every table.
+@override_settings(CHARGE_CREDITS_FOR_BOTS=False)
+class CleanUpBotsCommandTestCase(TestCase):
+    def setUp(self):
+        # Freeze the clock, so the times each test sets up and the cutoffs the command computes come from the same now
+        self.now = timezone.now()
+        now_patcher = patch("django.utils.timezone.now", return_value=self.now)
+        now_patcher.start()
+        self.addCleanup(now_patcher.stop)
+
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+
+        self.bot = Bot.objects.create(
+            project=self.project,
+            name="Test Bot",
+            meeting_url="https://meet.google.com/abc-defg-hij",
+        )
+
+        # Create default recording
+        Recording.objects.create(
+            bot=self.bot,
+            recording_type=RecordingTypes.AUDIO_AND_VIDEO,
+            transcription_type=TranscriptionTypes.NON_REALTIME,
+            transcription_provider=TranscriptionProviders.DEEPGRAM,
+            is_default_recording=True,
+        )
+
+        # Transition the state from READY to JOINING
+        BotEventManager.create_event(self.bot, BotEventTypes.JOIN_REQUESTED)
+
+    def patch_kubernetes_client(self):
+        """Patch the kubernetes client for the rest of the test, so pod deletions can be checked. Returns the mock CoreV1Api."""
+        mock_k8s_api = MagicMock()
+        for patcher in (
+            patch("kubernetes.client.CoreV1Api", return_value=mock_k8s_api),
+            # Make load_incluster_config raise ConfigException so load_kube_config gets called
+            patch("kubernetes.config.load_incluster_config", side_effect=kubernetes.config.config_exception.ConfigException("Mock ConfigException")),
+            patch("kubernetes.config.load_kube_config"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return mock_k8s_api
+
+    def test_terminate_bots_with_heartbeat_timeout(self):
+        mock_k8s_api = self.patch_kubernetes_client()
+
+        # Create a bot with a stale heartbeat (more than 10 minutes old)
+        current_time = int(self.now.timestamp())
+        eleven_minutes_ago = current_time - 660  # 11 minutes ago
+
+        # Set the bot's heartbeat timestamps
+        Bot.objects.filter(pk=self.bot.pk).update(
+            first_heartbeat_timestamp=eleven_minutes_ago,
+            last_heartbeat_timestamp=eleven_minutes_ago,
+            state=BotStates.JOINED_RECORDING,  # Set to a non-terminal state
+        )
+
+        # Set bot launch method to kubernetes
+        with patch.dict(os.environ, {"LAUNCH_BOT_METHOD": "kubernetes"}):
+            # Run the command
+            command = Command()
+            command.handle()
+
+        # Refresh the bot state from the database
+        self.bot.refresh_from_db()
+
+        # Verify the bot was moved to FATAL_ERROR state
+        self.assertEqual(self.bot.state, BotStates.FATAL_ERROR)
+
+        # Verify that a FATAL_ERROR event was created with the correct sub type
+        self.assertEqual(self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_HEARTBEAT_TIMEOUT).values_list("old_state", "new_state").first(), (BotStates.JOINED_RECORDING, BotStates.FATAL_ERROR))
+
+        # Verify Kubernetes pod deletion was attempted with the correct pod name
+        pod_name = self.bot.k8s_pod_name()
+        mock_k8s_api.delete_namespaced_pod.assert_called_once_with(name=pod_name, namespace="attendee", grace_period_seconds=0)
+
+    def test_bots_with_recent_heartbeat_not_terminated(self):
+        # Create a bot with a recent heartbeat (9 minutes old)
+        current_time = int(self.now.timestamp())
+        nine_minutes_ago = current_time - 540  # 9 minutes ago
+
+        # Set the bot's heartbeat timestamps
+        Bot.objects.filter(pk=self.bot.pk).update(
+            first_heartbeat_timestamp=nine_minutes_ago,
+            last_heartbeat_timestamp=nine_minutes_ago,
+            state=BotStates.JOINED_RECORDING,  # Set to a non-terminal state
+        )
+
+        # Run the command
+        command = Command()
+        command.handle()
+
+        # Refresh the bot state from the database
+        self.bot.refresh_from_db()
+
+        # Verify the bot was NOT moved to FATAL_ERROR state
+        self.assertEqual(self.bot.state, BotStates.JOINED_RECORDING)
+
+        # Verify that no FATAL_ERROR event was created with heartbeat timeout subtype
+        self.assertFalse(self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_HEARTBEAT_TIMEOUT).exists())
+
+    def test_terminate_bots_that_never_launched(self):
+        mock_k8s_api = self.patch_kubernetes_client()
+
+        # Create a bot that was created 2 days ago but never launched
+        two_days_ago = self.now - timezone.timedelta(days=2)
+        Bot.objects.filter(pk=self.bot.pk).update(
+            first_heartbeat_timestamp=None,
+            last_heartbeat_timestamp=None,
+            state=BotStates.JOINING,  # Set to a non-terminal state
+            created_at=two_days_ago,
+        )
+
+        # Set bot launch method to kubernetes
+        with patch.dict(os.environ, {"LAUNCH_BOT_METHOD": "kubernetes"}):
+            # Run the command
+            command = Command()
+            command.handle()
+
+        # Refresh the bot state from the database
+        self.bot.refresh_from_db()
+
+        # Verify the bot was moved to FATAL_ERROR state
+        self.assertEqual(self.bot.state, BotStates.FATAL_ERROR)
+
+        # Verify that a FATAL_ERROR event was created with the correct sub type
+        self.assertEqual(self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_BOT_NOT_LAUNCHED).values_list("old_state", "new_state").first(), (BotStates.JOINING, BotStates.FATAL_ERROR))
+
+        # Verify Kubernetes pod deletion was attempted with the correct pod name
+        pod_name = self.bot.k8s_pod_name()
+        mock_k8s_api.delete_namespaced_pod.assert_called_once_with(name=pod_name, namespace="attendee", grace_period_seconds=0)
+
+    def test_recent_bots_with_no_heartbeat_not_terminated(self):
+        # Create a bot that was created 30 minutes ago but never launched
+        thirty_minutes_ago = self.now - timezone.timedelta(minutes=30)
+        Bot.objects.filter(pk=self.bot.pk).update(
+            first_heartbeat_timestamp=None,
+            last_heartbeat_timestamp=None,
+            state=BotStates.JOINING,  # Set to a non-terminal state
+            created_at=thirty_minutes_ago,
+        )
+
+        # Run the command
+        command = Command()
+        command.handle()
+
+        # Refresh the bot state from the database
+        self.bot.refresh_from_db()
+
+        # Verify the bot was NOT moved to FATAL_ERROR state since it's too recent
+        self.assertEqual(self.bot.state, BotStates.JOINING)
+
+        # Verify that no FATAL_ERROR event was created for a bot that never launched
+        self.assertFalse(self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_BOT_NOT_LAUNCHED).exists())
+
+    def test_scheduled_bot_with_future_join_at_not_terminated(self):
+        mock_k8s_api = self.patch_kubernetes_client()
+
+        # Create a scheduled bot that was created 5 days ago but has join_at in the future
+        five_days_ago = self.now - timezone.timedelta(days=5)
+        one_hour_from_now = self.now + timezone.timedelta(hours=1)
+
+        Bot.objects.filter(pk=self.bot.pk).update(
+            created_at=five_days_ago,
+            join_at=one_hour_from_now,  # Future join time
+            first_heartbeat_timestamp=None,
+            last_heartbeat_timestamp=None,
+            state=BotStates.SCHEDULED,  # Set to scheduled state
+        )
+
+        # Set bot launch method to kubernetes
+        with patch.dict(os.environ, {"LAUNCH_BOT_METHOD": "kubernetes"}):
+            # Run the command
+            command = Command()
+            command.handle()
+
+        # Refresh the bot state from the database
+        self.bot.refresh_from_db()
+
+        # Verify the bot was NOT moved to FATAL_ERROR state since join_at is in the future
+        self.assertEqual(self.bot.state, BotStates.SCHEDULED)
+
+        # Verify that no FATAL_ERROR event was created for a bot that never launched
+        self.assertFalse(self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_BOT_NOT_LAUNCHED).exists())
+
+        # Verify that no pod deletion was attempted
+        mock_k8s_api.delete_namespaced_pod.assert_not_called()
+
+    def test_scheduled_bot_with_past_join_at_terminated(self):
+        mock_k8s_api = self.patch_kubernetes_client()
+
+        # Create a scheduled bot with join_at in the past (2 days ago) but never launched
+        two_days_ago = self.now - timezone.timedelta(days=2)
+
+        Bot.objects.filter(pk=self.bot.pk).update(
+            join_at=two_days_ago,  # Past join time
+            first_heartbeat_timestamp=None,
+            last_heartbeat_timestamp=None,
+            state=BotStates.SCHEDULED,  # Set to scheduled state
+        )
+
+        # Set bot launch method to kubernetes
+        with patch.dict(os.environ, {"LAUNCH_BOT_METHOD": "kubernetes"}):
+            # Run the command
+            command = Command()
+            command.handle()
+
+        # Refresh the bot state from the database
+        self.bot.refresh_from_db()
+
+        # Verify the bot was moved to FATAL_ERROR state since join_at was in the past and it never launched
+        self.assertEqual(self.bot.state, BotStates.FATAL_ERROR)
+
+        # Verify that a FATAL_ERROR event was created with the correct sub type
+        self.assertEqual(self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_BOT_NOT_LAUNCHED).values_list("old_state", "new_state").first(), (BotStates.SCHEDULED, BotStates.FATAL_ERROR))
+
+        # Verify Kubernetes pod deletion was attempted with the correct pod name
+        pod_name = self.bot.k8s_pod_name()
+        mock_k8s_api.delete_namespaced_pod.assert_called_once_with(name=pod_name, namespace="attendee", grace_period_seconds=0)
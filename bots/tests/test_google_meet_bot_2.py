@@ -1,12 +1,9 @@
 import os
 import threading
 import time
-from unittest.mock import MagicMock, call, patch
+from unittest.mock import MagicMock, patch
 
-import kubernetes
-from django.db import connection
 from django.test.testcases import TransactionTestCase, override_settings
-from django.utils import timezone
 from selenium.common.exceptions import TimeoutException
 
 from bots.bot_adapter import BotAdapter
@@ -15,7 +12,6 @@ from bots.google_meet_bot_adapter.google_meet_ui_methods import GoogleMeetUIMeth
 from bots.models import (
     Bot,
     BotEventManager,
-    BotEventSubTypes,
     BotEventTypes,
     BotStates,
     ChatMessage,
@@ -38,7 +34,7 @@ from bots.models import (
     WebhookSubscription,
     WebhookTriggerTypes,
 )
-from bots.tests.mock_data import create_mock_file_uploader, create_mock_google_meet_driver
+from bots.tests.mock_data import EXPECTED_BOT_EVENTS, EXPECTED_POST_JOIN_EXECUTE_SCRIPT_CALLS, create_mock_display, create_mock_file_uploader, create_mock_google_meet_driver, track_handled_adapter_messages
 from bots.web_bot_adapter.ui_methods import UiLoginRequiredException, UiRetryableException
 
 
@@ -79,16 +75,9 @@ from bots.web_bot_adapter.ui_methods import UiLoginRequiredException, UiRetryabl
         "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
     },
 )
+# Set required environment variables for each test only, rather than leaking them into the rest of the test run
+@patch.dict(os.environ, {"STORAGE_PROTOCOL": "azure", "AZURE_RECORDING_STORAGE_CONTAINER_NAME": "test-container", "CHARGE_CREDITS_FOR_BOTS": "false"})
 class TestGoogleMeetBot2(TransactionTestCase):
-    @classmethod
-    def setUpClass(cls):
-        super().setUpClass()
-
-        # Set required environment variables
-        os.environ["STORAGE_PROTOCOL"] = "azure"
-        os.environ["AZURE_RECORDING_STORAGE_CONTAINER_NAME"] = "test-container"
-        os.environ["CHARGE_CREDITS_FOR_BOTS"] = "false"
-
     def setUp(self):
         # Recreate organization and project for each test
         self.organization = Organization.objects.create(name="Test Org")
@@ -125,77 +114,12 @@ class TestGoogleMeetBot2(TransactionTestCase):
         settings.CELERY_TASK_ALWAYS_EAGER = True
         settings.CELERY_TASK_EAGER_PROPAGATES = True
 
-    @patch("kubernetes.client.CoreV1Api")
-    @patch("kubernetes.config.load_incluster_config")
-    @patch("kubernetes.config.load_kube_config")
-    def test_terminate_bots_with_heartbeat_timeout(self, mock_load_kube_config, mock_load_incluster_config, MockCoreV1Api):
-        # Set up mock Kubernetes API
-        mock_k8s_api = MagicMock()
-        MockCoreV1Api.return_value = mock_k8s_api
-
-        # Set up config.load_incluster_config to raise ConfigException so load_kube_config gets called
-        mock_load_incluster_config.side_effect = kubernetes.config.config_exception.ConfigException("Mock ConfigException")
-
-        # Create a bot with a stale heartbeat (more than 10 minutes old)
-        current_time = int(timezone.now().timestamp())
-        eleven_minutes_ago = current_time - 660  # 11 minutes ago
-
-        # Set the bot's heartbeat timestamps
-        self.bot.first_heartbeat_timestamp = eleven_minutes_ago
-        self.bot.last_heartbeat_timestamp = eleven_minutes_ago
-        self.bot.state = BotStates.JOINED_RECORDING  # Set to a non-terminal state
-        self.bot.save()
-
-        # Set bot launch method to kubernetes
-        with patch.dict(os.environ, {"LAUNCH_BOT_METHOD": "kubernetes"}):
-            # Import and run the command
-            from bots.management.commands.clean_up_bots_with_heartbeat_timeout_or_that_never_launched import Command
-
-            command = Command()
-            command.handle()
-
-        # Refresh the bot state from the database
-        self.bot.refresh_from_db()
-
-        # Verify the bot was moved to FATAL_ERROR state
-        self.assertEqual(self.bot.state, BotStates.FATAL_ERROR)
-
-        # Verify that a FATAL_ERROR event was created with the correct sub type
-        fatal_error_event = self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_HEARTBEAT_TIMEOUT).first()
-        self.assertIsNotNone(fatal_error_event)
-        self.assertEqual(fatal_error_event.old_state, BotStates.JOINED_RECORDING)
-        self.assertEqual(fatal_error_event.new_state, BotStates.FATAL_ERROR)
-
-        # Verify Kubernetes pod deletion was attempted with the correct pod name
-        pod_name = self.bot.k8s_pod_name()
-        mock_k8s_api.delete_namespaced_pod.assert_called_once_with(name=pod_name, namespace="attendee", grace_period_seconds=0)
-
-    def test_bots_with_recent_heartbeat_not_terminated(self):
-        # Create a bot with a recent heartbeat (9 minutes old)
-        current_time = int(timezone.now().timestamp())
-        nine_minutes_ago = current_time - 540  # 9 minutes ago
-
-        # Set the bot's heartbeat timestamps
-        self.bot.first_heartbeat_timestamp = nine_minutes_ago
-        self.bot.last_heartbeat_timestamp = nine_minutes_ago
-        self.bot.state = BotStates.JOINED_RECORDING  # Set to a non-terminal state
-        self.bot.save()
-
-        # Import and run the command
-        from bots.management.commands.clean_up_bots_with_heartbeat_timeout_or_that_never_launched import Command
-
-        command = Command()
-        command.handle()
-
-        # Refresh the bot state from the database
-        self.bot.refresh_from_db()
-
-        # Verify the bot was NOT moved to FATAL_ERROR state
-        self.assertEqual(self.bot.state, BotStates.JOINED_RECORDING)
-
-        # Verify that no FATAL_ERROR event was created with heartbeat timeout subtype
-        fatal_error_event = self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_HEARTBEAT_TIMEOUT).first()
-        self.assertIsNone(fatal_error_event)
+        # The web bot adapter pauses between join attempts, while the websocket server starts and before screen recording
+        # starts. None of that needs real time against the mocked driver, so cap its sleeps at 10ms. Only the adapter's own
+        # sleep is patched, not time.sleep, which the controller's hard-timeout thread relies on.
+        adapter_sleep_patcher = patch("bots.web_bot_adapter.web_bot_adapter.sleep", new=lambda seconds: time.sleep(min(seconds, 0.01)))
+        adapter_sleep_patcher.start()
+        self.addCleanup(adapter_sleep_patcher.stop)
 
     @patch("bots.web_bot_adapter.web_bot_adapter.Display")
     @patch("bots.web_bot_adapter.web_bot_adapter.webdriver.Chrome")
@@ -215,11 +139,12 @@ class TestGoogleMeetBot2(TransactionTestCase):
         MockChromeDriver.return_value = mock_driver
 
         # Mock virtual display
-        mock_display = MagicMock()
+        mock_display = create_mock_display()
         MockDisplay.return_value = mock_display
 
         # Create bot controller
         controller = BotController(self.bot.id)
+        handled_adapter_messages = track_handled_adapter_messages(controller)
 
         # Set up a side effect that raises an exception on first attempt, then succeeds on second attempt
         with patch("bots.google_meet_bot_adapter.google_meet_ui_methods.GoogleMeetUIMethods.attempt_to_join_meeting") as mock_attempt_to_join:
@@ -233,11 +158,12 @@ class TestGoogleMeetBot2(TransactionTestCase):
             bot_thread.daemon = True
             bot_thread.start()
 
-            # Allow time for the retry logic to run
-            time.sleep(5)
+            # Wait until the bot has retried joining and started recording
+            self.assertTrue(handled_adapter_messages[BotAdapter.Messages.BOT_RECORDING_PERMISSION_GRANTED].wait(timeout=10), "Bot did not start recording")
 
+            # Trigger only one participant in meeting auto leave, then wait for the bot to finish cleaning up
             controller.adapter.only_one_participant_in_meeting_at = time.time() - 10000000000
-            time.sleep(4)
+            self.assertTrue(controller.ended_event.wait(timeout=10), "Bot did not finish cleaning up")
 
             # Verify the attempt_to_join_meeting method was called twice
             self.assertEqual(mock_attempt_to_join.call_count, 2, "attempt_to_join_meeting should be called twice - once for the initial failure and once for the retry")
@@ -245,192 +171,26 @@ class TestGoogleMeetBot2(TransactionTestCase):
             # Verify joining succeeded after retry by checking that these methods were called
             self.assertTrue(mock_driver.execute_script.called, "execute_script should be called after successful retry")
 
-            # Now wait for the thread to finish naturally
-            bot_thread.join(timeout=5)  # Give it time to clean up
-
-            # If thread is still running after timeout, that's a problem to report
-            if bot_thread.is_alive():
-                print("WARNING: Bot thread did not terminate properly after cleanup")
-
-            # Close the database connection since we're in a thread
-            connection.close()
-
-    @patch("kubernetes.client.CoreV1Api")
-    @patch("kubernetes.config.load_incluster_config")
-    @patch("kubernetes.config.load_kube_config")
-    def test_terminate_bots_that_never_launched(self, mock_load_kube_config, mock_load_incluster_config, MockCoreV1Api):
-        # Set up mock Kubernetes API
-        mock_k8s_api = MagicMock()
-        MockCoreV1Api.return_value = mock_k8s_api
-
-        # Set up config.load_incluster_config to raise ConfigException so load_kube_config gets called
-        mock_load_incluster_config.side_effect = kubernetes.config.config_exception.ConfigException("Mock ConfigException")
-
-        # Create a bot that was created 2 days ago but never launched
-        two_days_ago = timezone.now() - timezone.timedelta(days=2)
-        self.bot.first_heartbeat_timestamp = None
-        self.bot.last_heartbeat_timestamp = None
-        self.bot.state = BotStates.JOINING  # Set to a non-terminal state
-        self.bot.created_at = two_days_ago
-        self.bot.save()
-
-        # Set bot launch method to kubernetes
-        with patch.dict(os.environ, {"LAUNCH_BOT_METHOD": "kubernetes"}):
-            # Import and run the command
-            from bots.management.commands.clean_up_bots_with_heartbeat_timeout_or_that_never_launched import Command
-
-            command = Command()
-            command.handle()
-
-        # Refresh the bot state from the database
-        self.bot.refresh_from_db()
-
-        # Verify the bot was moved to FATAL_ERROR state
-        self.assertEqual(self.bot.state, BotStates.FATAL_ERROR)
-
-        # Verify that a FATAL_ERROR event was created with the correct sub type
-        fatal_error_event = self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_BOT_NOT_LAUNCHED).first()
-        self.assertIsNotNone(fatal_error_event)
-        self.assertEqual(fatal_error_event.old_state, BotStates.JOINING)
-        self.assertEqual(fatal_error_event.new_state, BotStates.FATAL_ERROR)
-
-        # Verify Kubernetes pod deletion was attempted with the correct pod name
-        pod_name = self.bot.k8s_pod_name()
-        mock_k8s_api.delete_namespaced_pod.assert_called_once_with(name=pod_name, namespace="attendee", grace_period_seconds=0)
-
-    def test_recent_bots_with_no_heartbeat_not_terminated(self):
-        # Create a bot that was created 30 minutes ago but never launched
-        thirty_minutes_ago = timezone.now() - timezone.timedelta(minutes=30)
-        self.bot.first_heartbeat_timestamp = None
-        self.bot.last_heartbeat_timestamp = None
-        self.bot.state = BotStates.JOINING  # Set to a non-terminal state
-        self.bot.created_at = thirty_minutes_ago
-        self.bot.save()
-
-        # Import and run the command
-        from bots.management.commands.clean_up_bots_with_heartbeat_timeout_or_that_never_launched import Command
-
-        command = Command()
-        command.handle()
-
-        # Refresh the bot state from the database
-        self.bot.refresh_from_db()
-
-        # Verify the bot was NOT moved to FATAL_ERROR state since it's too recent
-        self.assertEqual(self.bot.state, BotStates.JOINING)
-
-        # Verify that no FATAL_ERROR event was created for a bot that never launched
-        fatal_error_event = self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_BOT_NOT_LAUNCHED).first()
-        self.assertIsNone(fatal_error_event)
-
-    @patch("kubernetes.client.CoreV1Api")
-    @patch("kubernetes.config.load_incluster_config")
-    @patch("kubernetes.config.load_kube_config")
-    def test_scheduled_bot_with_future_join_at_not_terminated(self, mock_load_kube_config, mock_load_incluster_config, MockCoreV1Api):
-        # Set up mock Kubernetes API
-        mock_k8s_api = MagicMock()
-        MockCoreV1Api.return_value = mock_k8s_api
-
-        # Set up config.load_incluster_config to raise ConfigException so load_kube_config gets called
-        mock_load_incluster_config.side_effect = kubernetes.config.config_exception.ConfigException("Mock ConfigException")
-
-        # Create a scheduled bot that was created 5 days ago but has join_at in the future
-        five_days_ago = timezone.now() - timezone.timedelta(days=5)
-        one_hour_from_now = timezone.now() + timezone.timedelta(hours=1)
-
-        self.bot.created_at = five_days_ago
-        self.bot.join_at = one_hour_from_now  # Future join time
-        self.bot.first_heartbeat_timestamp = None
-        self.bot.last_heartbeat_timestamp = None
-        self.bot.state = BotStates.SCHEDULED  # Set to scheduled state
-        self.bot.save()
-
-        # Set bot launch method to kubernetes
-        with patch.dict(os.environ, {"LAUNCH_BOT_METHOD": "kubernetes"}):
-            # Import and run the command
-            from bots.management.commands.clean_up_bots_with_heartbeat_timeout_or_that_never_launched import Command
-
-            command = Command()
-            command.handle()
-
-        # Refresh the bot state from the database
-        self.bot.refresh_from_db()
-
-        # Verify the bot was NOT moved to FATAL_ERROR state since join_at is in the future
-        self.assertEqual(self.bot.state, BotStates.SCHEDULED)
-
-        # Verify that no FATAL_ERROR event was created for a bot that never launched
-        fatal_error_event = self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_BOT_NOT_LAUNCHED).first()
-        self.assertIsNone(fatal_error_event)
-
-        # Verify that no pod deletion was attempted
-        mock_k8s_api.delete_namespaced_pod.assert_not_called()
-
-    @patch("kubernetes.client.CoreV1Api")
-    @patch("kubernetes.config.load_incluster_config")
-    @patch("kubernetes.config.load_kube_config")
-    def test_scheduled_bot_with_past_join_at_terminated(self, mock_load_kube_config, mock_load_incluster_config, MockCoreV1Api):
-        # Set up mock Kubernetes API
-        mock_k8s_api = MagicMock()
-        MockCoreV1Api.return_value = mock_k8s_api
-
-        # Set up config.load_incluster_config to raise ConfigException so load_kube_config gets called
-        mock_load_incluster_config.side_effect = kubernetes.config.config_exception.ConfigException("Mock ConfigException")
-
-        # Create a scheduled bot with join_at in the past (2 days ago) but never launched
-        two_days_ago = timezone.now() - timezone.timedelta(days=2)
+            # The bot has already finished cleaning up, so its thread should exit right away
+            bot_thread.join(timeout=1)
+            self.assertFalse(bot_thread.is_alive(), "Bot thread failed to terminate")
 
-        self.bot.join_at = two_days_ago  # Past join time
-        self.bot.first_heartbeat_timestamp = None
-        self.bot.last_heartbeat_timestamp = None
-        self.bot.state = BotStates.SCHEDULED  # Set to scheduled state
-        self.bot.save()
-
-        # Set bot launch method to kubernetes
-        with patch.dict(os.environ, {"LAUNCH_BOT_METHOD": "kubernetes"}):
-            # Import and run the command
-            from bots.management.commands.clean_up_bots_with_heartbeat_timeout_or_that_never_launched import Command
-
-            command = Command()
-            command.handle()
-
-        # Refresh the bot state from the database
-        self.bot.refresh_from_db()
-
-        # Verify the bot was moved to FATAL_ERROR state since join_at was in the past and it never launched
-        self.assertEqual(self.bot.state, BotStates.FATAL_ERROR)
-
-        # Verify that a FATAL_ERROR event was created with the correct sub type
-        fatal_error_event = self.bot.bot_events.filter(event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_BOT_NOT_LAUNCHED).first()
-        self.assertIsNotNone(fatal_error_event)
-        self.assertEqual(fatal_error_event.old_state, BotStates.SCHEDULED)
-        self.assertEqual(fatal_error_event.new_state, BotStates.FATAL_ERROR)
+    def start_bot_and_wait_until_recording(self, controller, timeout=10):
+        """Runs the controller on its own thread, since it has an event loop, and returns the thread once the bot has started recording."""
+        handled_adapter_messages = track_handled_adapter_messages(controller)
+        bot_thread = threading.Thread(target=controller.run, daemon=True)
+        bot_thread.start()
+        self.assertTrue(handled_adapter_messages[BotAdapter.Messages.BOT_RECORDING_PERMISSION_GRANTED].wait(timeout=timeout), "Bot did not start recording")
+        return bot_thread
 
-        # Verify Kubernetes pod deletion was attempted with the correct pod name
-        pod_name = self.bot.k8s_pod_name()
-        mock_k8s_api.delete_namespaced_pod.assert_called_once_with(name=pod_name, namespace="attendee", grace_period_seconds=0)
-
-    @patch("bots.models.Bot.create_debug_recording", return_value=False)
-    @patch("bots.web_bot_adapter.web_bot_adapter.Display")
-    @patch("bots.web_bot_adapter.web_bot_adapter.webdriver.Chrome")
-    @patch("bots.bot_controller.bot_controller.AzureFileUploader")
-    @patch("bots.google_meet_bot_adapter.google_meet_ui_methods.GoogleMeetUIMethods.check_if_meeting_is_found", return_value=None)
-    @patch("bots.google_meet_bot_adapter.google_meet_ui_methods.GoogleMeetUIMethods.wait_for_host_if_needed", return_value=None)
-    @patch("time.time")
-    @patch("bots.tasks.deliver_webhook_task.deliver_webhook")
-    def test_bot_can_join_meeting_and_record_with_closed_caption_transcription(
-        self,
-        mock_deliver_webhook,
-        mock_time,
-        mock_wait_for_host_if_needed,
-        mock_check_if_meeting_is_found,
-        MockFileUploader,
-        MockChromeDriver,
-        MockDisplay,
-        mock_create_debug_recording,
-    ):
-        mock_deliver_webhook.return_value = None
+    def leave_meeting_and_wait_until_ended(self, controller, bot_thread):
+        """Triggers the only-one-participant auto leave and waits for the bot to finish cleaning up."""
+        controller.adapter.only_one_participant_in_meeting_at = time.time() - 10000000000
+        self.assertTrue(controller.ended_event.wait(timeout=10), "Bot did not finish cleaning up")
+        bot_thread.join(timeout=0.5)
 
+    def run_meeting_with_closed_captions(self, mock_time, MockFileUploader, MockChromeDriver, MockDisplay, caption_text, chat_message_text):
+        """Runs a bot through a meeting where one participant joins, speaks (via closed captions), chats and leaves. Returns once the bot has ended."""
         self.webhook_subscription = WebhookSubscription.objects.create(
             project=self.project,
             url="https://example.com/webhook",
@@ -455,27 +215,12 @@ class TestGoogleMeetBot2(TransactionTestCase):
         MockChromeDriver.return_value = mock_driver
 
         # Mock virtual display
-        mock_display = MagicMock()
+        mock_display = create_mock_display()
         MockDisplay.return_value = mock_display
 
         # Create bot controller
         controller = BotController(self.bot.id)
 
-        # Patch the controller's on_message_from_adapter method to add debugging
-        original_on_message_from_adapter = controller.on_message_from_adapter
-
-        def debug_on_message_from_adapter(message):
-            original_on_message_from_adapter(message)
-            if message.get("message") == BotAdapter.Messages.BOT_JOINED_MEETING:
-                simulate_caption_data_arrival()
-
-        controller.on_message_from_adapter = debug_on_message_from_adapter
-
-        # Run the bot in a separate thread since it has an event loop
-        bot_thread = threading.Thread(target=controller.run)
-        bot_thread.daemon = True
-        bot_thread.start()
-
         def simulate_participants_joining():
             # Simulate the bot joining the meeting
             bot_participant_data = {"deviceId": "bot1", "fullName": "Test Bot", "active": True, "isCurrentUser": True}
@@ -492,7 +237,7 @@ class TestGoogleMeetBot2(TransactionTestCase):
 
         def simulate_caption_data_arrival():
             # Simulate caption data arrival
-            caption_data = {"captionId": "caption1", "deviceId": "user1", "text": "This is a test caption from closed captions", "isFinal": 1}
+            caption_data = {"captionId": "caption1", "deviceId": "user1", "text": caption_text, "isFinal": 1}
             controller.closed_caption_manager.upsert_caption(caption_data)
 
             # Force caption processing by flushing
@@ -503,42 +248,53 @@ class TestGoogleMeetBot2(TransactionTestCase):
                 "participant_uuid": "user1",
                 "message_uuid": "msg123",
                 "timestamp": int(current_time * 1000),  # Convert to milliseconds
-                "text": "Hello, this is a test chat message!",
+                "text": chat_message_text,
                 "to_bot": False,
                 "additional_data": {"source": "test"},
             }
             controller.on_new_chat_message(chat_message_data)
 
-        def simulate_join_flow():
-            nonlocal current_time
+        # Patch the controller's on_message_from_adapter method to add debugging
+        original_on_message_from_adapter = controller.on_message_from_adapter
 
-            simulate_participants_joining()
+        def debug_on_message_from_adapter(message):
+            original_on_message_from_adapter(message)
+            if message.get("message") == BotAdapter.Messages.BOT_JOINED_MEETING:
+                simulate_caption_data_arrival()
 
-            simulate_caption_data_arrival()
+        controller.on_message_from_adapter = debug_on_message_from_adapter
 
-            # Simulate receiving audio by updating the last audio message processed time
-            controller.adapter.last_audio_message_processed_time = current_time
+        # Run the bot until it has joined and started recording
+        bot_thread = self.start_bot_and_wait_until_recording(controller)
 
-            # Sleep to allow caption processing
-            time.sleep(3)
+        simulate_participants_joining()
 
-            simulate_participants_leaving()
+        # Captions are flushed to the database synchronously, so there's nothing to wait for afterwards
+        simulate_caption_data_arrival()
 
-            # Trigger only one participant in meeting auto leave
-            controller.adapter.only_one_participant_in_meeting_at = time.time() - 10000000000
-            time.sleep(4)
+        # Simulate receiving audio by updating the last audio message processed time
+        controller.adapter.last_audio_message_processed_time = current_time
 
-            # Clean up connections in thread
-            connection.close()
+        simulate_participants_leaving()
 
-        # Run join flow simulation after a short delay
-        threading.Timer(2, simulate_join_flow).start()
+        # Trigger only one participant in meeting auto leave, then wait for the bot to finish cleaning up
+        self.leave_meeting_and_wait_until_ended(controller, bot_thread)
 
-        # Give the bot some time to process
-        bot_thread.join(timeout=10)
+        return controller, bot_thread, mock_uploader, mock_driver
 
-        # Refresh the bot from the database
-        self.bot.refresh_from_db()
+    def get_first_webhook_payload(self, webhook_trigger_type, msg):
+        """Returns the payload of the bot's first webhook delivery attempt for the trigger type, in a single query. Fails the test with msg if there are none."""
+        payload = WebhookDeliveryAttempt.objects.filter(bot=self.bot, webhook_trigger_type=webhook_trigger_type).values_list("payload", flat=True).first()
+        self.assertIsNotNone(payload, msg)
+        return payload
+
+    def assert_meeting_with_closed_captions_results(self, controller, mock_driver, caption_text, chat_message_text):
+        """Checks the bot, transcript, chat, participant and webhook state left behind by run_meeting_with_closed_captions."""
+        # Reload the recording together with its bot, then the bot's events
+        with self.assertNumQueries(2):
+            self.recording = Recording.objects.select_related("bot").get(pk=self.recording.pk)
+            self.bot = self.recording.bot
+            bot_events = tuple(self.bot.bot_events.values_list("event_type", "old_state", "new_state"))
 
         # Assert that the heartbeat timestamp was set
         self.assertIsNotNone(self.bot.first_heartbeat_timestamp)
@@ -551,95 +307,40 @@ class TestGoogleMeetBot2(TransactionTestCase):
         self.assertEqual(self.bot.state, BotStates.ENDED)
 
         # Verify bot events in sequence
-        bot_events = self.bot.bot_events.all()
-        self.assertEqual(len(bot_events), 6)  # We expect 6 events in total
-
-        # Verify join_requested_event (Event 1)
-        join_requested_event = bot_events[0]
-        self.assertEqual(join_requested_event.event_type, BotEventTypes.JOIN_REQUESTED)
-        self.assertEqual(join_requested_event.old_state, BotStates.READY)
-        self.assertEqual(join_requested_event.new_state, BotStates.JOINING)
-
-        # Verify bot_joined_meeting_event (Event 2)
-        bot_joined_meeting_event = bot_events[1]
-        self.assertEqual(bot_joined_meeting_event.event_type, BotEventTypes.BOT_JOINED_MEETING)
-        self.assertEqual(bot_joined_meeting_event.old_state, BotStates.JOINING)
-        self.assertEqual(bot_joined_meeting_event.new_state, BotStates.JOINED_NOT_RECORDING)
-
-        # Verify recording_permission_granted_event (Event 3)
-        recording_permission_granted_event = bot_events[2]
-        self.assertEqual(
-            recording_permission_granted_event.event_type,
-            BotEventTypes.BOT_RECORDING_PERMISSION_GRANTED,
-        )
-        self.assertEqual(recording_permission_granted_event.old_state, BotStates.JOINED_NOT_RECORDING)
-        self.assertEqual(recording_permission_granted_event.new_state, BotStates.JOINED_RECORDING)
-
-        # Verify bot requested to leave meeting (Event 4)
-        bot_requested_to_leave_meeting_event = bot_events[3]
-        self.assertEqual(bot_requested_to_leave_meeting_event.event_type, BotEventTypes.LEAVE_REQUESTED)
-        self.assertEqual(bot_requested_to_leave_meeting_event.old_state, BotStates.JOINED_RECORDING)
-        self.assertEqual(bot_requested_to_leave_meeting_event.new_state, BotStates.LEAVING)
-
-        # Verify bot left meeting (Event 5)
-        bot_left_meeting_event = bot_events[4]
-        self.assertEqual(bot_left_meeting_event.event_type, BotEventTypes.BOT_LEFT_MEETING)
-        self.assertEqual(bot_left_meeting_event.old_state, BotStates.LEAVING)
-        self.assertEqual(bot_left_meeting_event.new_state, BotStates.POST_PROCESSING)
-
-        # Verify post_processing_completed_event (Event 6)
-        post_processing_completed_event = bot_events[5]
-        self.assertEqual(post_processing_completed_event.event_type, BotEventTypes.POST_PROCESSING_COMPLETED)
-        self.assertEqual(post_processing_completed_event.old_state, BotStates.POST_PROCESSING)
-        self.assertEqual(post_processing_completed_event.new_state, BotStates.ENDED)
+        self.assertEqual(bot_events, EXPECTED_BOT_EVENTS)
 
         # Verify that the recording was finished
-        self.recording.refresh_from_db()
         self.assertEqual(self.recording.state, RecordingStates.COMPLETE)
 
-        # Verify captions were processed as utterances
-        utterances = Utterance.objects.filter(recording=self.recording)
-        self.assertGreater(utterances.count(), 0)
-
-        # Verify a caption utterance exists with the correct text
-        caption_utterance = utterances.filter(source=Utterance.Sources.CLOSED_CAPTION_FROM_PLATFORM).first()
-        self.assertIsNotNone(caption_utterance)
-        self.assertEqual(caption_utterance.transcription.get("transcript"), "This is a test caption from closed captions")
-
-        # Verify webhook delivery attempts were created for transcript updates
-        webhook_delivery_attempts = WebhookDeliveryAttempt.objects.filter(bot=self.bot, webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE)
-        self.assertGreater(webhook_delivery_attempts.count(), 0, "Expected webhook delivery attempts for transcript updates")
-
-        # Verify the webhook payload contains the expected utterance data
-        webhook_attempt = webhook_delivery_attempts.first()
-        self.assertIsNotNone(webhook_attempt.payload)
-        self.assertIn("speaker_name", webhook_attempt.payload)
-        self.assertIn("speaker_uuid", webhook_attempt.payload)
-        self.assertIn("transcription", webhook_attempt.payload)
-        self.assertEqual(webhook_attempt.payload["speaker_name"], "Test User")
-        self.assertEqual(webhook_attempt.payload["speaker_uuid"], "user1")
-        self.assertIsNotNone(webhook_attempt.payload["transcription"])
+        # Verify captions were processed as utterances, with the correct text
+        caption_transcription = Utterance.objects.filter(recording=self.recording, source=Utterance.Sources.CLOSED_CAPTION_FROM_PLATFORM).values_list("transcription", flat=True).first()
+        self.assertIsNotNone(caption_transcription)
+        self.assertEqual(caption_transcription.get("transcript"), caption_text)
+
+        # Verify a webhook delivery attempt was created for transcript updates, and its payload contains the expected utterance data
+        webhook_payload = self.get_first_webhook_payload(WebhookTriggerTypes.TRANSCRIPT_UPDATE, "Expected webhook delivery attempts for transcript updates")
+        self.assertIn("speaker_name", webhook_payload)
+        self.assertIn("speaker_uuid", webhook_payload)
+        self.assertIn("transcription", webhook_payload)
+        self.assertEqual(webhook_payload["speaker_name"], "Test User")
+        self.assertEqual(webhook_payload["speaker_uuid"], "user1")
+        self.assertIsNotNone(webhook_payload["transcription"])
 
         # Verify chat message was created
-        chat_messages = ChatMessage.objects.filter(bot=self.bot)
-        self.assertGreater(chat_messages.count(), 0, "Expected at least one chat message to be created")
+        chat_messages = ChatMessage.objects.filter(bot=self.bot).select_related("participant")
+        self.assertTrue(chat_messages.exists(), "Expected at least one chat message to be created")
 
         # Verify the chat message has the correct content
         chat_message = chat_messages.first()
-        self.assertEqual(chat_message.text, "Hello, this is a test chat message!")
+        self.assertEqual(chat_message.text, chat_message_text)
         self.assertEqual(chat_message.participant.full_name, "Test User")
         self.assertEqual(chat_message.participant.uuid, "user1")
 
-        # Verify webhook delivery attempts were created for chat messages
-        chat_webhook_delivery_attempts = WebhookDeliveryAttempt.objects.filter(bot=self.bot, webhook_trigger_type=WebhookTriggerTypes.CHAT_MESSAGES_UPDATE)
-        self.assertGreater(chat_webhook_delivery_attempts.count(), 0, "Expected webhook delivery attempts for chat messages")
-
-        # Verify the chat message webhook payload contains the expected data
-        chat_webhook_attempt = chat_webhook_delivery_attempts.first()
-        self.assertIsNotNone(chat_webhook_attempt.payload)
-        self.assertIn("text", chat_webhook_attempt.payload)
-        self.assertIn("sender_name", chat_webhook_attempt.payload)
-        self.assertEqual(chat_webhook_attempt.payload["text"], "Hello, this is a test chat message!")
+        # Verify a webhook delivery attempt was created for chat messages, and its payload contains the expected data
+        chat_webhook_payload = self.get_first_webhook_payload(WebhookTriggerTypes.CHAT_MESSAGES_UPDATE, "Expected webhook delivery attempts for chat messages")
+        self.assertIn("text", chat_webhook_payload)
+        self.assertIn("sender_name", chat_webhook_payload)
+        self.assertEqual(chat_webhook_payload["text"], chat_message_text)
 
         # Verify Bot Participant was created
         bot_participant = Participant.objects.filter(bot=self.bot, uuid="bot1").first()
@@ -656,15 +357,15 @@ class TestGoogleMeetBot2(TransactionTestCase):
         self.assertFalse(user_participant.is_the_bot)
 
         # Verify Bot ParticipantEvent was created
-        bot_participant_events = ParticipantEvent.objects.filter(participant__bot=self.bot, participant__uuid="bot1")
-        self.assertGreater(bot_participant_events.count(), 0, "Expected at least one participant event to be created")
+        bot_participant_events = ParticipantEvent.objects.filter(participant__bot=self.bot, participant__uuid="bot1").select_related("participant")
+        self.assertTrue(bot_participant_events.exists(), "Expected at least one participant event to be created")
         join_event = bot_participant_events.filter(event_type=ParticipantEventTypes.JOIN).first()
         self.assertIsNotNone(join_event)
         self.assertEqual(join_event.participant.full_name, "Test Bot")
 
         # Verify ParticipantEvent was created
-        participant_events = ParticipantEvent.objects.filter(participant__bot=self.bot, participant__uuid="user1")
-        self.assertGreater(participant_events.count(), 0, "Expected at least one participant event to be created")
+        participant_events = ParticipantEvent.objects.filter(participant__bot=self.bot, participant__uuid="user1").select_related("participant")
+        self.assertTrue(participant_events.exists(), "Expected at least one participant event to be created")
         join_event = participant_events.filter(event_type=ParticipantEventTypes.JOIN).first()
         self.assertIsNotNone(join_event)
         self.assertEqual(join_event.participant.full_name, "Test User")
@@ -673,37 +374,56 @@ class TestGoogleMeetBot2(TransactionTestCase):
         self.assertIsNotNone(leave_event)
         self.assertEqual(leave_event.participant.full_name, "Test User")
 
-        # Verify webhook for participant event was created
-        participant_webhook_delivery_attempts = WebhookDeliveryAttempt.objects.filter(bot=self.bot, webhook_trigger_type=WebhookTriggerTypes.PARTICIPANT_EVENTS_JOIN_LEAVE)
-        self.assertGreater(participant_webhook_delivery_attempts.count(), 0, "Expected webhook delivery attempts for participant events")
+        # Verify webhooks for participant events were created. Their payloads are fetched once and split by event type here.
+        participant_webhook_payloads = list(WebhookDeliveryAttempt.objects.filter(bot=self.bot, webhook_trigger_type=WebhookTriggerTypes.PARTICIPANT_EVENTS_JOIN_LEAVE).order_by("pk").values_list("payload", flat=True))
+        self.assertGreater(len(participant_webhook_payloads), 0, "Expected webhook delivery attempts for participant events")
 
-        participant_webhook_attempts = participant_webhook_delivery_attempts.filter(payload__event_type="join").all()
-        self.assertEqual(len(participant_webhook_attempts), 1)
-        participant_webhook_attempt = participant_webhook_attempts[0]
-        self.assertIsNotNone(participant_webhook_attempt.payload)
-        self.assertEqual(participant_webhook_attempt.payload["event_type"], "join")
-        self.assertEqual(participant_webhook_attempt.payload["participant_name"], "Test User")
+        join_webhook_payloads = [payload for payload in participant_webhook_payloads if payload.get("event_type") == "join"]
+        self.assertEqual(len(join_webhook_payloads), 1)
+        self.assertEqual(join_webhook_payloads[0]["participant_name"], "Test User")
 
-        leave_webhook_attempt = participant_webhook_delivery_attempts.filter(payload__event_type="leave").first()
-        self.assertIsNotNone(leave_webhook_attempt)
-        self.assertEqual(leave_webhook_attempt.payload["event_type"], "leave")
-        self.assertEqual(leave_webhook_attempt.payload["participant_name"], "Test User")
+        leave_webhook_payloads = [payload for payload in participant_webhook_payloads if payload.get("event_type") == "leave"]
+        self.assertGreater(len(leave_webhook_payloads), 0, "Expected a webhook delivery attempt for the participant leaving")
+        self.assertEqual(leave_webhook_payloads[0]["participant_name"], "Test User")
 
         # Verify WebSocket media sending was enabled and performance.timeOrigin was queried
-        mock_driver.execute_script.assert_has_calls([call("window.ws?.enableMediaSending();"), call("return performance.timeOrigin;")])
+        mock_driver.execute_script.assert_has_calls(EXPECTED_POST_JOIN_EXECUTE_SCRIPT_CALLS)
+
+    @patch("bots.models.Bot.create_debug_recording", return_value=False)
+    @patch("bots.web_bot_adapter.web_bot_adapter.Display")
+    @patch("bots.web_bot_adapter.web_bot_adapter.webdriver.Chrome")
+    @patch("bots.bot_controller.bot_controller.AzureFileUploader")
+    @patch("bots.google_meet_bot_adapter.google_meet_ui_methods.GoogleMeetUIMethods.check_if_meeting_is_found", return_value=None)
+    @patch("bots.google_meet_bot_adapter.google_meet_ui_methods.GoogleMeetUIMethods.wait_for_host_if_needed", return_value=None)
+    @patch("time.time")
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook")
+    def test_bot_can_join_meeting_and_record_with_closed_caption_transcription(
+        self,
+        mock_deliver_webhook,
+        mock_time,
+        mock_wait_for_host_if_needed,
+        mock_check_if_meeting_is_found,
+        MockFileUploader,
+        MockChromeDriver,
+        MockDisplay,
+        mock_create_debug_recording,
+    ):
+        mock_deliver_webhook.return_value = None
+
+        caption_text = "This is a test caption from closed captions"
+        chat_message_text = "Hello, this is a test chat message!"
+        controller, bot_thread, mock_uploader, mock_driver = self.run_meeting_with_closed_captions(mock_time, MockFileUploader, MockChromeDriver, MockDisplay, caption_text, chat_message_text)
+        self.assert_meeting_with_closed_captions_results(controller, mock_driver, caption_text, chat_message_text)
 
         # Verify file uploader was used
         mock_uploader.upload_file.assert_called_once()
-        self.assertGreater(mock_uploader.upload_file.call_count, 0)
         mock_uploader.wait_for_upload.assert_called_once()
         mock_uploader.delete_file.assert_called_once()
 
-        # Cleanup
+        # Cleanup. The bot has already ended, so this shouldn't need to wait for anything.
         controller.cleanup()
-        bot_thread.join(timeout=5)
-
-        # Close the database connection since we're in a thread
-        connection.close()
+        bot_thread.join(timeout=1)
+        self.assertFalse(bot_thread.is_alive(), "Bot thread failed to terminate")
 
     @patch("bots.models.Bot.create_debug_recording", return_value=False)
     @patch("bots.web_bot_adapter.web_bot_adapter.Display")
@@ -738,39 +458,18 @@ class TestGoogleMeetBot2(TransactionTestCase):
         MockChromeDriver.return_value = mock_driver
 
         # Mock virtual display
-        mock_display = MagicMock()
+        mock_display = create_mock_display()
         MockDisplay.return_value = mock_display
 
-        # Create bot controller
+        # Create the bot controller and run it until the bot has joined and started recording
         controller = BotController(self.bot.id)
+        bot_thread = self.start_bot_and_wait_until_recording(controller)
 
-        # Run the bot in a separate thread since it has an event loop
-        bot_thread = threading.Thread(target=controller.run)
-        bot_thread.daemon = True
-        bot_thread.start()
+        # Add participants to keep the bot in the meeting
+        controller.adapter.participants_info["user1"] = {"deviceId": "user1", "fullName": "Test User", "active": True, "isCurrentUser": False}
 
-        def simulate_join_flow():
-            # Sleep to allow initialization
-            time.sleep(2)
-
-            # Add participants to keep the bot in the meeting
-            controller.adapter.participants_info["user1"] = {"deviceId": "user1", "fullName": "Test User", "active": True, "isCurrentUser": False}
-
-            # Let the bot run for a bit to "record"
-            time.sleep(3)
-
-            # Trigger auto-leave
-            controller.adapter.only_one_participant_in_meeting_at = time.time() - 10000000000
-            time.sleep(4)
-
-            # Clean up connections in thread
-            connection.close()
-
-        # Run join flow simulation after a short delay
-        threading.Timer(2, simulate_join_flow).start()
-
-        # Give the bot some time to process
-        bot_thread.join(timeout=10)
+        # Trigger auto-leave, then wait for the bot to finish cleaning up
+        self.leave_meeting_and_wait_until_ended(controller, bot_thread)
 
         # Refresh the bot from the database
         self.bot.refresh_from_db()
@@ -785,13 +484,6 @@ class TestGoogleMeetBot2(TransactionTestCase):
         # Verify file uploader was used. This implies a file was created and handled.
         mock_uploader.upload_file.assert_called_once()
 
-        # Cleanup
-        controller.cleanup()
-        bot_thread.join(timeout=5)
-
-        # Close the database connection since we're in a thread
-        connection.close()
-
     @patch("bots.models.Bot.create_debug_recording", return_value=False)
     @patch("bots.web_bot_adapter.web_bot_adapter.Display")
     @patch("bots.web_bot_adapter.web_bot_adapter.webdriver.Chrome")
@@ -830,107 +522,60 @@ class TestGoogleMeetBot2(TransactionTestCase):
         MockChromeDriver.return_value = mock_driver
 
         # Mock virtual display
-        mock_display = MagicMock()
+        mock_display = create_mock_display()
         MockDisplay.return_value = mock_display
 
-        # Create bot controller
+        # Create the bot controller and run it until the bot has joined and started recording
         controller = BotController(self.bot.id)
+        bot_thread = self.start_bot_and_wait_until_recording(controller)
 
-        # Run the bot in a separate thread since it has an event loop
-        bot_thread = threading.Thread(target=controller.run)
-        bot_thread.daemon = True
-        bot_thread.start()
-
-        self.original_recording_started_at = None
-
-        def simulate_pause_resume_flow():
-            nonlocal current_time
-            # Sleep to allow initialization and joining
-            time.sleep(3)
-
-            # Add participants - simulate websocket message processing
-            controller.adapter.participants_info["user1"] = {"deviceId": "user1", "fullName": "Test User", "active": True, "isCurrentUser": False}
-
-            # Simulate receiving audio to keep bot alive
-            controller.adapter.last_audio_message_processed_time = current_time
-
-            # Wait for bot to be in recording state
-            timeout = time.time() + 10
-            while time.time() < timeout:
-                controller.bot_in_db.refresh_from_db()
-                if controller.bot_in_db.state == BotStates.JOINED_RECORDING:
-                    break
-                time.sleep(0.1)
-
-            # Verify we're in recording state
-            controller.bot_in_db.refresh_from_db()
-            self.assertEqual(controller.bot_in_db.state, BotStates.JOINED_RECORDING)
-
-            self.original_recording_started_at = controller.bot_in_db.recordings.first().started_at
+        def current_bot_state():
+            # Read just the state column, rather than refreshing the controller's own Bot instance from this thread
+            return Bot.objects.values_list("state", flat=True).get(pk=self.bot.pk)
 
-            # Send closed caption before pause (should create utterance)
-            # Simulate caption coming through the web bot adapter
-            caption_json_before_pause = {"type": "CaptionUpdate", "caption": {"captionId": "caption1", "deviceId": "user1", "text": "Caption before pause", "isFinal": 1}}
-            controller.adapter.handle_caption_update(caption_json_before_pause)
+        # Add participants - simulate websocket message processing
+        controller.adapter.participants_info["user1"] = {"deviceId": "user1", "fullName": "Test User", "active": True, "isCurrentUser": False}
 
-            time.sleep(1)
+        # Simulate receiving audio to keep bot alive
+        controller.adapter.last_audio_message_processed_time = current_time
 
-            # Pause recording
-            controller.pause_recording()
+        # Verify we're in recording state
+        self.assertEqual(current_bot_state(), BotStates.JOINED_RECORDING)
 
-            # Wait for pause to take effect
-            timeout = time.time() + 5
-            while time.time() < timeout:
-                controller.bot_in_db.refresh_from_db()
-                if controller.bot_in_db.state == BotStates.JOINED_RECORDING_PAUSED:
-                    break
-                time.sleep(0.1)
+        original_recording_started_at = controller.bot_in_db.recordings.first().started_at
 
-            # Verify we're in paused state
-            controller.bot_in_db.refresh_from_db()
-            self.assertEqual(controller.bot_in_db.state, BotStates.JOINED_RECORDING_PAUSED)
+        # Send closed caption before pause (should create utterance)
+        # Simulate caption coming through the web bot adapter, then flush it so it's saved while the recording is in progress
+        caption_json_before_pause = {"type": "CaptionUpdate", "caption": {"captionId": "caption1", "deviceId": "user1", "text": "Caption before pause", "isFinal": 1}}
+        controller.adapter.handle_caption_update(caption_json_before_pause)
+        controller.closed_caption_manager.flush_captions()
 
-            # Send closed caption during pause (should NOT create utterance)
-            # Simulate caption coming through the web bot adapter - this should be ignored due to recording_paused check
-            caption_json_during_pause = {"type": "CaptionUpdate", "caption": {"captionId": "caption2", "deviceId": "user1", "text": "Caption during pause", "isFinal": 1}}
-            controller.adapter.handle_caption_update(caption_json_during_pause)
+        # Pause recording. The pause event is created before this returns, so there's nothing to wait for.
+        controller.pause_recording()
 
-            time.sleep(1)
+        # Verify we're in paused state
+        self.assertEqual(current_bot_state(), BotStates.JOINED_RECORDING_PAUSED)
 
-            # Resume recording
-            controller.resume_recording()
+        # Send closed caption during pause (should NOT create utterance)
+        # Simulate caption coming through the web bot adapter - this should be ignored due to recording_paused check
+        caption_json_during_pause = {"type": "CaptionUpdate", "caption": {"captionId": "caption2", "deviceId": "user1", "text": "Caption during pause", "isFinal": 1}}
+        controller.adapter.handle_caption_update(caption_json_during_pause)
+        controller.closed_caption_manager.flush_captions()
 
-            # Wait for resume to take effect
-            timeout = time.time() + 5
-            while time.time() < timeout:
-                controller.bot_in_db.refresh_from_db()
-                if controller.bot_in_db.state == BotStates.JOINED_RECORDING:
-                    break
-                time.sleep(0.1)
+        # Resume recording. Like pausing, this takes effect before it returns.
+        controller.resume_recording()
 
-            # Verify we're back in recording state
-            controller.bot_in_db.refresh_from_db()
-            self.assertEqual(controller.bot_in_db.state, BotStates.JOINED_RECORDING)
+        # Verify we're back in recording state
+        self.assertEqual(current_bot_state(), BotStates.JOINED_RECORDING)
 
-            # Send closed caption after resume (should create utterance)
-            # Simulate caption coming through the web bot adapter
-            caption_json_after_resume = {"type": "CaptionUpdate", "caption": {"captionId": "caption3", "deviceId": "user1", "text": "Caption after resume", "isFinal": 1}}
-            controller.adapter.handle_caption_update(caption_json_after_resume)
+        # Send closed caption after resume (should create utterance)
+        # Simulate caption coming through the web bot adapter
+        caption_json_after_resume = {"type": "CaptionUpdate", "caption": {"captionId": "caption3", "deviceId": "user1", "text": "Caption after resume", "isFinal": 1}}
+        controller.adapter.handle_caption_update(caption_json_after_resume)
+        controller.closed_caption_manager.flush_captions()
 
-            time.sleep(1)
-
-            # Trigger leave to end the test
-            controller.adapter.only_one_participant_in_meeting_at = time.time() - 10000000000
-            time.sleep(5)
-
-            # Clean up connections in thread
-            connection.close()
-
-        # Run simulation after a short delay
-        threading.Timer(2, simulate_pause_resume_flow).start()
-
-        # Give the bot some time to process
-        bot_thread.join(timeout=20)
+        # Trigger leave to end the test, then wait for the bot to finish cleaning up
+        self.leave_meeting_and_wait_until_ended(controller, bot_thread)
 
         # Refresh the bot from the database
         self.bot.refresh_from_db()
@@ -938,8 +583,8 @@ class TestGoogleMeetBot2(TransactionTestCase):
         # Assert that the bot ended properly
         self.assertEqual(self.bot.state, BotStates.ENDED)
 
-        # Verify bot events include pause and resume
-        bot_events = self.bot.bot_events.all()
+        # Verify bot events include pause and resume. The events are read once, as named tuples rather than model instances.
+        bot_events = list(self.bot.bot_events.values_list("event_type", "old_state", "new_state", named=True))
         event_types = [event.event_type for event in bot_events]
 
         # Check that we have the expected sequence of events including pause and resume
@@ -951,18 +596,14 @@ class TestGoogleMeetBot2(TransactionTestCase):
         # Verify the sequence of recording-related events
         recording_events = [e for e in bot_events if e.event_type in [BotEventTypes.BOT_RECORDING_PERMISSION_GRANTED, BotEventTypes.RECORDING_PAUSED, BotEventTypes.RECORDING_RESUMED]]
 
-        self.assertEqual(len(recording_events), 3)
-        self.assertEqual(recording_events[0].event_type, BotEventTypes.BOT_RECORDING_PERMISSION_GRANTED)
-        self.assertEqual(recording_events[0].old_state, BotStates.JOINED_NOT_RECORDING)
-        self.assertEqual(recording_events[0].new_state, BotStates.JOINED_RECORDING)
-
-        self.assertEqual(recording_events[1].event_type, BotEventTypes.RECORDING_PAUSED)
-        self.assertEqual(recording_events[1].old_state, BotStates.JOINED_RECORDING)
-        self.assertEqual(recording_events[1].new_state, BotStates.JOINED_RECORDING_PAUSED)
-
-        self.assertEqual(recording_events[2].event_type, BotEventTypes.RECORDING_RESUMED)
-        self.assertEqual(recording_events[2].old_state, BotStates.JOINED_RECORDING_PAUSED)
-        self.assertEqual(recording_events[2].new_state, BotStates.JOINED_RECORDING)
+        self.assertEqual(
+            [(e.event_type, e.old_state, e.new_state) for e in recording_events],
+            [
+                (BotEventTypes.BOT_RECORDING_PERMISSION_GRANTED, BotStates.JOINED_NOT_RECORDING, BotStates.JOINED_RECORDING),
+                (BotEventTypes.RECORDING_PAUSED, BotStates.JOINED_RECORDING, BotStates.JOINED_RECORDING_PAUSED),
+                (BotEventTypes.RECORDING_RESUMED, BotStates.JOINED_RECORDING_PAUSED, BotStates.JOINED_RECORDING),
+            ],
+        )
 
         # Verify utterances were created correctly
         utterances = Utterance.objects.filter(recording=self.recording).order_by("created_at")
@@ -978,14 +619,7 @@ class TestGoogleMeetBot2(TransactionTestCase):
         # Verify that the recording was completed
         self.recording.refresh_from_db()
         self.assertEqual(self.recording.state, RecordingStates.COMPLETE)
-        self.assertEqual(self.recording.started_at, self.original_recording_started_at)
-
-        # Cleanup
-        controller.cleanup()
-        bot_thread.join(timeout=5)
-
-        # Close the database connection since we're in a thread
-        connection.close()
+        self.assertEqual(self.recording.started_at, original_recording_started_at)
 
     @patch("bots.models.Bot.create_debug_recording", return_value=False)
     @patch("bots.web_bot_adapter.web_bot_adapter.Display")
@@ -1016,278 +650,20 @@ class TestGoogleMeetBot2(TransactionTestCase):
         }
         self.bot.save()
 
-        self.webhook_subscription = WebhookSubscription.objects.create(
-            project=self.project,
-            url="https://example.com/webhook",
-            triggers=[WebhookTriggerTypes.BOT_STATE_CHANGE, WebhookTriggerTypes.TRANSCRIPT_UPDATE, WebhookTriggerTypes.CHAT_MESSAGES_UPDATE, WebhookTriggerTypes.PARTICIPANT_EVENTS_JOIN_LEAVE],
-            is_active=True,
-        )
-
-        # Set initial time
-        current_time = 1000.0
-        mock_time.return_value = current_time
-
-        # Use closed captions for transcription
-        self.recording.transcription_provider = TranscriptionProviders.CLOSED_CAPTION_FROM_PLATFORM
-        self.recording.save()
-
-        # Configure the mock uploader
-        mock_uploader = create_mock_file_uploader()
-        MockFileUploader.return_value = mock_uploader
-
-        # Mock the Chrome driver
-        mock_driver = create_mock_google_meet_driver()
-        MockChromeDriver.return_value = mock_driver
-
-        # Mock virtual display
-        mock_display = MagicMock()
-        MockDisplay.return_value = mock_display
-
-        # Create bot controller
-        controller = BotController(self.bot.id)
-
-        # Patch the controller's on_message_from_adapter method to add debugging
-        original_on_message_from_adapter = controller.on_message_from_adapter
-
-        def debug_on_message_from_adapter(message):
-            original_on_message_from_adapter(message)
-            if message.get("message") == BotAdapter.Messages.BOT_JOINED_MEETING:
-                simulate_caption_data_arrival()
-
-        controller.on_message_from_adapter = debug_on_message_from_adapter
-
-        # Run the bot in a separate thread since it has an event loop
-        bot_thread = threading.Thread(target=controller.run)
-        bot_thread.daemon = True
-        bot_thread.start()
-
-        def simulate_participants_joining():
-            # Simulate the bot joining the meeting
-            bot_participant_data = {"deviceId": "bot1", "fullName": "Test Bot", "active": True, "isCurrentUser": True}
-            controller.adapter.handle_participant_update(bot_participant_data)
-
-            # Simulate participant joining
-            participant_data = {"deviceId": "user1", "fullName": "Test User", "active": True, "isCurrentUser": False}
-            controller.adapter.handle_participant_update(participant_data)
-
-        def simulate_participants_leaving():
-            # Simulate participant leaving
-            participant_data = {"deviceId": "user1", "fullName": "Test User", "active": False, "isCurrentUser": False}
-            controller.adapter.handle_participant_update(participant_data)
-
-        def simulate_caption_data_arrival():
-            # Simulate caption data arrival
-            caption_data = {"captionId": "caption1", "deviceId": "user1", "text": "This is a test caption with no recording format", "isFinal": 1}
-            controller.closed_caption_manager.upsert_caption(caption_data)
-
-            # Force caption processing by flushing
-            controller.closed_caption_manager.flush_captions()
-
-            # Simulate chat message arrival
-            chat_message_data = {
-                "participant_uuid": "user1",
-                "message_uuid": "msg123",
-                "timestamp": int(current_time * 1000),  # Convert to milliseconds
-                "text": "Hello, this is a test chat message with no recording!",
-                "to_bot": False,
-                "additional_data": {"source": "test"},
-            }
-            controller.on_new_chat_message(chat_message_data)
-
-        def simulate_join_flow():
-            nonlocal current_time
-
-            simulate_participants_joining()
-
-            simulate_caption_data_arrival()
-
-            # Simulate receiving audio by updating the last audio message processed time
-            controller.adapter.last_audio_message_processed_time = current_time
-
-            # Sleep to allow caption processing
-            time.sleep(3)
-
-            simulate_participants_leaving()
-
-            # Trigger only one participant in meeting auto leave
-            controller.adapter.only_one_participant_in_meeting_at = time.time() - 10000000000
-            time.sleep(4)
-
-            # Clean up connections in thread
-            connection.close()
-
-        # Run join flow simulation after a short delay
-        threading.Timer(2, simulate_join_flow).start()
-
-        # Give the bot some time to process
-        bot_thread.join(timeout=10)
-
-        # Refresh the bot from the database
-        self.bot.refresh_from_db()
-
-        # Assert that the heartbeat timestamp was set
-        self.assertIsNotNone(self.bot.first_heartbeat_timestamp)
-        self.assertIsNotNone(self.bot.last_heartbeat_timestamp)
-
-        # Assert that joined at is not none
-        self.assertIsNotNone(controller.adapter.joined_at)
-
-        # Assert that the bot is in the ENDED state
-        self.assertEqual(self.bot.state, BotStates.ENDED)
-
-        # Verify bot events in sequence
-        bot_events = self.bot.bot_events.all()
-        self.assertEqual(len(bot_events), 6)  # We expect 6 events in total
-
-        # Verify join_requested_event (Event 1)
-        join_requested_event = bot_events[0]
-        self.assertEqual(join_requested_event.event_type, BotEventTypes.JOIN_REQUESTED)
-        self.assertEqual(join_requested_event.old_state, BotStates.READY)
-        self.assertEqual(join_requested_event.new_state, BotStates.JOINING)
-
-        # Verify bot_joined_meeting_event (Event 2)
-        bot_joined_meeting_event = bot_events[1]
-        self.assertEqual(bot_joined_meeting_event.event_type, BotEventTypes.BOT_JOINED_MEETING)
-        self.assertEqual(bot_joined_meeting_event.old_state, BotStates.JOINING)
-        self.assertEqual(bot_joined_meeting_event.new_state, BotStates.JOINED_NOT_RECORDING)
-
-        # Verify recording_permission_granted_event (Event 3)
-        recording_permission_granted_event = bot_events[2]
-        self.assertEqual(
-            recording_permission_granted_event.event_type,
-            BotEventTypes.BOT_RECORDING_PERMISSION_GRANTED,
-        )
-        self.assertEqual(recording_permission_granted_event.old_state, BotStates.JOINED_NOT_RECORDING)
-        self.assertEqual(recording_permission_granted_event.new_state, BotStates.JOINED_RECORDING)
-
-        # Verify bot requested to leave meeting (Event 4)
-        bot_requested_to_leave_meeting_event = bot_events[3]
-        self.assertEqual(bot_requested_to_leave_meeting_event.event_type, BotEventTypes.LEAVE_REQUESTED)
-        self.assertEqual(bot_requested_to_leave_meeting_event.old_state, BotStates.JOINED_RECORDING)
-        self.assertEqual(bot_requested_to_leave_meeting_event.new_state, BotStates.LEAVING)
-
-        # Verify bot left meeting (Event 5)
-        bot_left_meeting_event = bot_events[4]
-        self.assertEqual(bot_left_meeting_event.event_type, BotEventTypes.BOT_LEFT_MEETING)
-        self.assertEqual(bot_left_meeting_event.old_state, BotStates.LEAVING)
-        self.assertEqual(bot_left_meeting_event.new_state, BotStates.POST_PROCESSING)
-
-        # Verify post_processing_completed_event (Event 6)
-        post_processing_completed_event = bot_events[5]
-        self.assertEqual(post_processing_completed_event.event_type, BotEventTypes.POST_PROCESSING_COMPLETED)
-        self.assertEqual(post_processing_completed_event.old_state, BotStates.POST_PROCESSING)
-        self.assertEqual(post_processing_completed_event.new_state, BotStates.ENDED)
-
-        # Verify that the recording was finished even with no recording format
-        self.recording.refresh_from_db()
-        self.assertEqual(self.recording.state, RecordingStates.COMPLETE)
-
-        # Verify captions were processed as utterances
-        utterances = Utterance.objects.filter(recording=self.recording)
-        self.assertGreater(utterances.count(), 0)
-
-        # Verify a caption utterance exists with the correct text
-        caption_utterance = utterances.filter(source=Utterance.Sources.CLOSED_CAPTION_FROM_PLATFORM).first()
-        self.assertIsNotNone(caption_utterance)
-        self.assertEqual(caption_utterance.transcription.get("transcript"), "This is a test caption with no recording format")
-
-        # Verify webhook delivery attempts were created for transcript updates
-        webhook_delivery_attempts = WebhookDeliveryAttempt.objects.filter(bot=self.bot, webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE)
-        self.assertGreater(webhook_delivery_attempts.count(), 0, "Expected webhook delivery attempts for transcript updates")
-
-        # Verify the webhook payload contains the expected utterance data
-        webhook_attempt = webhook_delivery_attempts.first()
-        self.assertIsNotNone(webhook_attempt.payload)
-        self.assertIn("speaker_name", webhook_attempt.payload)
-        self.assertIn("speaker_uuid", webhook_attempt.payload)
-        self.assertIn("transcription", webhook_attempt.payload)
-        self.assertEqual(webhook_attempt.payload["speaker_name"], "Test User")
-        self.assertEqual(webhook_attempt.payload["speaker_uuid"], "user1")
-        self.assertIsNotNone(webhook_attempt.payload["transcription"])
-
-        # Verify chat message was created
-        chat_messages = ChatMessage.objects.filter(bot=self.bot)
-        self.assertGreater(chat_messages.count(), 0, "Expected at least one chat message to be created")
-
-        # Verify the chat message has the correct content
-        chat_message = chat_messages.first()
-        self.assertEqual(chat_message.text, "Hello, this is a test chat message with no recording!")
-        self.assertEqual(chat_message.participant.full_name, "Test User")
-        self.assertEqual(chat_message.participant.uuid, "user1")
-
-        # Verify webhook delivery attempts were created for chat messages
-        chat_webhook_delivery_attempts = WebhookDeliveryAttempt.objects.filter(bot=self.bot, webhook_trigger_type=WebhookTriggerTypes.CHAT_MESSAGES_UPDATE)
-        self.assertGreater(chat_webhook_delivery_attempts.count(), 0, "Expected webhook delivery attempts for chat messages")
-
-        # Verify the chat message webhook payload contains the expected data
-        chat_webhook_attempt = chat_webhook_delivery_attempts.first()
-        self.assertIsNotNone(chat_webhook_attempt.payload)
-        self.assertIn("text", chat_webhook_attempt.payload)
-        self.assertIn("sender_name", chat_webhook_attempt.payload)
-        self.assertEqual(chat_webhook_attempt.payload["text"], "Hello, this is a test chat message with no recording!")
-
-        # Verify Bot Participant was created
-        bot_participant = Participant.objects.filter(bot=self.bot, uuid="bot1").first()
-        self.assertIsNotNone(bot_participant)
-        self.assertEqual(bot_participant.full_name, "Test Bot")
-        self.assertEqual(bot_participant.uuid, "bot1")
-        self.assertTrue(bot_participant.is_the_bot)
-
-        # Verify User Participant was created
-        user_participant = Participant.objects.filter(bot=self.bot, uuid="user1").first()
-        self.assertIsNotNone(user_participant)
-        self.assertEqual(user_participant.full_name, "Test User")
-        self.assertEqual(user_participant.uuid, "user1")
-        self.assertFalse(user_participant.is_the_bot)
-
-        # Verify Bot ParticipantEvent was created
-        bot_participant_events = ParticipantEvent.objects.filter(participant__bot=self.bot, participant__uuid="bot1")
-        self.assertGreater(bot_participant_events.count(), 0, "Expected at least one participant event to be created")
-        join_event = bot_participant_events.filter(event_type=ParticipantEventTypes.JOIN).first()
-        self.assertIsNotNone(join_event)
-        self.assertEqual(join_event.participant.full_name, "Test Bot")
-
-        # Verify ParticipantEvent was created
-        participant_events = ParticipantEvent.objects.filter(participant__bot=self.bot, participant__uuid="user1")
-        self.assertGreater(participant_events.count(), 0, "Expected at least one participant event to be created")
-        join_event = participant_events.filter(event_type=ParticipantEventTypes.JOIN).first()
-        self.assertIsNotNone(join_event)
-        self.assertEqual(join_event.participant.full_name, "Test User")
-
-        leave_event = participant_events.filter(event_type=ParticipantEventTypes.LEAVE).first()
-        self.assertIsNotNone(leave_event)
-        self.assertEqual(leave_event.participant.full_name, "Test User")
-
-        # Verify webhook for participant event was created
-        participant_webhook_delivery_attempts = WebhookDeliveryAttempt.objects.filter(bot=self.bot, webhook_trigger_type=WebhookTriggerTypes.PARTICIPANT_EVENTS_JOIN_LEAVE)
-        self.assertGreater(participant_webhook_delivery_attempts.count(), 0, "Expected webhook delivery attempts for participant events")
-
-        participant_webhook_attempts = participant_webhook_delivery_attempts.filter(payload__event_type="join").all()
-        self.assertEqual(len(participant_webhook_attempts), 1)
-        participant_webhook_attempt = participant_webhook_attempts[0]
-        self.assertIsNotNone(participant_webhook_attempt.payload)
-        self.assertEqual(participant_webhook_attempt.payload["event_type"], "join")
-        self.assertEqual(participant_webhook_attempt.payload["participant_name"], "Test User")
-
-        leave_webhook_attempt = participant_webhook_delivery_attempts.filter(payload__event_type="leave").first()
-        self.assertIsNotNone(leave_webhook_attempt)
-        self.assertEqual(leave_webhook_attempt.payload["event_type"], "leave")
-        self.assertEqual(leave_webhook_attempt.payload["participant_name"], "Test User")
-
-        # Verify WebSocket media sending was enabled and performance.timeOrigin was queried
-        mock_driver.execute_script.assert_has_calls([call("window.ws?.enableMediaSending();"), call("return performance.timeOrigin;")])
+        caption_text = "This is a test caption with no recording format"
+        chat_message_text = "Hello, this is a test chat message with no recording!"
+        controller, bot_thread, mock_uploader, mock_driver = self.run_meeting_with_closed_captions(mock_time, MockFileUploader, MockChromeDriver, MockDisplay, caption_text, chat_message_text)
+        self.assert_meeting_with_closed_captions_results(controller, mock_driver, caption_text, chat_message_text)
 
         # CRITICAL: Verify file uploader was NOT used since recording format is "none"
         mock_uploader.upload_file.assert_not_called()
         mock_uploader.wait_for_upload.assert_not_called()
         mock_uploader.delete_file.assert_not_called()
 
-        # Cleanup
+        # Cleanup. The bot has already ended, so this shouldn't need to wait for anything.
         controller.cleanup()
-        bot_thread.join(timeout=5)
-
-        # Close the database connection since we're in a thread
-        connection.close()
+        bot_thread.join(timeout=1)
+        self.assertFalse(bot_thread.is_alive(), "Bot thread failed to terminate")
 
     @patch("bots.models.Bot.create_debug_recording", return_value=False)
     @patch("bots.web_bot_adapter.web_bot_adapter.Display")
@@ -1330,39 +706,18 @@ class TestGoogleMeetBot2(TransactionTestCase):
         MockChromeDriver.return_value = mock_driver
 
         # Mock virtual display
-        mock_display = MagicMock()
+        mock_display = create_mock_display()
         MockDisplay.return_value = mock_display
 
-        # Create bot controller
+        # Create the bot controller and run it until the bot has joined and started recording
         controller = BotController(self.bot.id)
+        bot_thread = self.start_bot_and_wait_until_recording(controller)
 
-        # Run the bot in a separate thread since it has an event loop
-        bot_thread = threading.Thread(target=controller.run)
-        bot_thread.daemon = True
-        bot_thread.start()
-
-        def simulate_join_flow():
-            # Sleep to allow initialization
-            time.sleep(2)
+        # Add participants to keep the bot in the meeting
+        controller.adapter.participants_info["user1"] = {"deviceId": "user1", "fullName": "Test User", "active": True, "isCurrentUser": False}
 
-            # Add participants to keep the bot in the meeting
-            controller.adapter.participants_info["user1"] = {"deviceId": "user1", "fullName": "Test User", "active": True, "isCurrentUser": False}
-
-            # Let the bot run for a bit to "record"
-            time.sleep(3)
-
-            # Trigger auto-leave
-            controller.adapter.only_one_participant_in_meeting_at = time.time() - 10000000000
-            time.sleep(4)
-
-            # Clean up connections in thread
-            connection.close()
-
-        # Run join flow simulation after a short delay
-        threading.Timer(2, simulate_join_flow).start()
-
-        # Give the bot some time to process
-        bot_thread.join(timeout=10)
+        # Trigger auto-leave, then wait for the bot to finish cleaning up
+        self.leave_meeting_and_wait_until_ended(controller, bot_thread)
 
         # Refresh the bot from the database
         self.bot.refresh_from_db()
@@ -1399,19 +754,12 @@ class TestGoogleMeetBot2(TransactionTestCase):
         # Check the second call (regular storage) - should use environment variables
         regular_call_args = MockAzureFileUploader.call_args_list[0]
         regular_call_kwargs = regular_call_args.kwargs
-        self.assertEqual(regular_call_kwargs["container"], "test-container")  # From environment variable set in setUpClass
+        self.assertEqual(regular_call_kwargs["container"], "test-container")  # From the environment variable patched in for each test
         self.assertIsNotNone(regular_call_kwargs["filename"])  # Should have some recording filename
 
         # Verify only one delete_file call (for the regular storage uploader)
         mock_azure_uploader.delete_file.assert_called_once()
 
-        # Cleanup
-        controller.cleanup()
-        bot_thread.join(timeout=5)
-
-        # Close the database connection since we're in a thread
-        connection.close()
-
     @patch("bots.models.Bot.create_debug_recording", return_value=False)
     @patch("bots.web_bot_adapter.web_bot_adapter.Display")
     @patch("bots.web_bot_adapter.web_bot_adapter.webdriver.Chrome")
@@ -1478,7 +826,7 @@ class TestGoogleMeetBot2(TransactionTestCase):
         MockChromeDriver.return_value = mock_driver
 
         # Mock virtual display
-        mock_display = MagicMock()
+        mock_display = create_mock_display()
         MockDisplay.return_value = mock_display
 
         # Track calls to look_for_login_required_element to control when login is required
@@ -1528,36 +876,15 @@ class TestGoogleMeetBot2(TransactionTestCase):
         ):
             mock_login.side_effect = mock_login_side_effect
 
-            # Create bot controller
+            # Create the bot controller and run it until the bot has logged in on its second join attempt and started recording
             controller = BotController(self.bot.id)
+            bot_thread = self.start_bot_and_wait_until_recording(controller, timeout=20)
 
-            # Run the bot in a separate thread since it has an event loop
-            bot_thread = threading.Thread(target=controller.run)
-            bot_thread.daemon = True
-            bot_thread.start()
-
-            def simulate_join_flow():
-                # Sleep to allow initialization and join attempts
-                time.sleep(1)
-
-                # Add participants to keep the bot in the meeting
-                controller.adapter.participants_info["user1"] = {"deviceId": "user1", "fullName": "Test User", "active": True, "isCurrentUser": False}
-
-                # Let the bot run for a bit to "record"
-                time.sleep(1)
-
-                # Trigger auto-leave
-                controller.adapter.only_one_participant_in_meeting_at = time.time() - 10000000000
-                time.sleep(1)
-
-                # Clean up connections in thread
-                connection.close()
-
-            # Run join flow simulation after a short delay
-            threading.Timer(2, simulate_join_flow).start()
+            # Add participants to keep the bot in the meeting
+            controller.adapter.participants_info["user1"] = {"deviceId": "user1", "fullName": "Test User", "active": True, "isCurrentUser": False}
 
-            # Give the bot some time to process
-            bot_thread.join(timeout=20)
+            # Trigger auto-leave, then wait for the bot to finish cleaning up
+            self.leave_meeting_and_wait_until_ended(controller, bot_thread)
 
             # Refresh the bot from the database
             self.bot.refresh_from_db()
@@ -1587,10 +914,3 @@ class TestGoogleMeetBot2(TransactionTestCase):
 
             # Verify file uploader was used
             mock_uploader.upload_file.assert_called_once()
-
-            # Cleanup
-            controller.cleanup()
-            bot_thread.join(timeout=5)
-
-            # Close the database connection since we're in a thread
-            connection.close()
@@ -10,66 +10,75 @@ from bots.models import Bot, BotStates, Calendar, CalendarPlatform, CalendarStat
 
 
 class RunSchedulerCommandTestCase(TestCase):
-    def setUp(self):
-        """Set up test data"""
-        self.organization = Organization.objects.create(
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data shared by every test, created once for the class"""
+        cls.organization = Organization.objects.create(
             name="Test Organization",
             centicredits=10000,  # 100 credits
         )
-        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        cls.project = Project.objects.create(name="Test Project", organization=cls.organization)
 
-        # Create test times
+    def setUp(self):
+        """Set up test times and the command under test"""
         self.now = django_timezone.now().replace(microsecond=0, second=0)
         self.join_at_within_threshold = self.now + django_timezone.timedelta(minutes=3)
         self.join_at_too_early = self.now + django_timezone.timedelta(minutes=7)  # Outside threshold
         self.join_at_too_late = self.now - django_timezone.timedelta(minutes=7)  # Outside threshold
 
+        # A fresh command per test, since _graceful_exit changes its state
+        self.command = Command()
+
     def test_run_scheduled_bots_launches_eligible_bots(self):
         """Test that _run_scheduled_bots finds and launches bots within the time threshold"""
-        # Create bots with different states and times
-        eligible_bot = Bot.objects.create(project=self.project, name="Eligible Bot", meeting_url="https://example.zoom.us/j/123456789", state=BotStates.SCHEDULED, join_at=self.join_at_within_threshold)
-
-        # Bot that's too early (outside threshold)
-        Bot.objects.create(project=self.project, name="Too Early Bot", meeting_url="https://example.zoom.us/j/987654321", state=BotStates.SCHEDULED, join_at=self.join_at_too_early)
-
-        # Bot that's not in SCHEDULED state
-        Bot.objects.create(project=self.project, name="Wrong State Bot", meeting_url="https://example.zoom.us/j/111222333", state=BotStates.READY, join_at=self.join_at_within_threshold)
-
-        command = Command()
+        # Create bots with different states and times in one INSERT. bulk_create skips Bot.save, which is what normally generates object_id, so each bot is given one.
+        eligible_bot, _, _ = Bot.objects.bulk_create(
+            [
+                Bot(project=self.project, object_id="bot_eligible", name="Eligible Bot", meeting_url="https://example.zoom.us/j/123456789", state=BotStates.SCHEDULED, join_at=self.join_at_within_threshold),
+                # Bot that's too early (outside threshold)
+                Bot(project=self.project, object_id="bot_too_early", name="Too Early Bot", meeting_url="https://example.zoom.us/j/987654321", state=BotStates.SCHEDULED, join_at=self.join_at_too_early),
+                # Bot that's not in SCHEDULED state
+                Bot(project=self.project, object_id="bot_wrong_state", name="Wrong State Bot", meeting_url="https://example.zoom.us/j/111222333", state=BotStates.READY, join_at=self.join_at_within_threshold),
+            ]
+        )
 
         with patch("bots.tasks.launch_scheduled_bot_task.launch_scheduled_bot.delay") as mock_delay:
-            with patch("django.utils.timezone.now", return_value=self.now):
-                command._run_scheduled_bots()
+            # One SELECT ... FOR UPDATE for the bots in the join window, plus the savepoint
+            # that transaction.atomic() creates and releases inside the test's transaction
+            with patch("django.utils.timezone.now", return_value=self.now), self.assertNumQueries(3):
+                self.command._run_scheduled_bots()
 
             # Verify only the eligible bot was launched
             mock_delay.assert_called_once_with(eligible_bot.id, self.join_at_within_threshold.isoformat())
 
     def test_graceful_shutdown_signal_handling(self):
         """Test that the signal handler properly sets the shutdown flag"""
-        command = Command()
-
         # Verify initial state
-        self.assertTrue(command._keep_running)
+        self.assertTrue(self.command._keep_running)
 
         # Simulate receiving SIGTERM
-        command._graceful_exit(signal.SIGTERM, None)
+        self.command._graceful_exit(signal.SIGTERM, None)
 
         # Verify the shutdown flag was set
-        self.assertFalse(command._keep_running)
+        self.assertFalse(self.command._keep_running)
 
     def test_run_scheduled_bots_ignores_bots_outside_time_threshold(self):
         """Test that bots outside the 5-minute time window are ignored"""
-        # Create a bot that's too late (missed by more than 5 minutes)
-        Bot.objects.create(project=self.project, name="Too Late Bot", meeting_url="https://example.zoom.us/j/444555666", state=BotStates.SCHEDULED, join_at=self.join_at_too_late)
-
-        # Create a bot that's too early (more than 5 minutes in the future)
-        Bot.objects.create(project=self.project, name="Too Early Bot", meeting_url="https://example.zoom.us/j/777888999", state=BotStates.SCHEDULED, join_at=self.join_at_too_early)
-
-        command = Command()
+        # Create the bots in one INSERT. bulk_create skips Bot.save, so each bot is given its object_id.
+        Bot.objects.bulk_create(
+            [
+                # A bot that's too late (missed by more than 5 minutes)
+                Bot(project=self.project, object_id="bot_too_late", name="Too Late Bot", meeting_url="https://example.zoom.us/j/444555666", state=BotStates.SCHEDULED, join_at=self.join_at_too_late),
+                # A bot that's too early (more than 5 minutes in the future)
+                Bot(project=self.project, object_id="bot_too_early", name="Too Early Bot", meeting_url="https://example.zoom.us/j/777888999", state=BotStates.SCHEDULED, join_at=self.join_at_too_early),
+            ]
+        )
 
         with patch("bots.tasks.launch_scheduled_bot_task.launch_scheduled_bot.delay") as mock_delay:
-            with patch("django.utils.timezone.now", return_value=self.now):
-                command._run_scheduled_bots()
+            # One SELECT ... FOR UPDATE for the bots in the join window, plus the savepoint
+            # that transaction.atomic() creates and releases inside the test's transaction
+            with patch("django.utils.timezone.now", return_value=self.now), self.assertNumQueries(3):
+                self.command._run_scheduled_bots()
 
             # Verify no bots were launched since they're all outside the time threshold
             mock_delay.assert_not_called()
@@ -80,11 +89,9 @@ class RunSchedulerCommandTestCase(TestCase):
         recent_sync_time = self.now - django_timezone.timedelta(hours=12)
         Calendar.objects.create(project=self.project, platform=CalendarPlatform.GOOGLE, state=CalendarStates.CONNECTED, sync_task_enqueued_at=recent_sync_time, client_id="test_client_id")
 
-        command = Command()
-
         with patch("bots.tasks.sync_calendar_task.enqueue_sync_calendar_task") as mock_enqueue:
             with patch("django.utils.timezone.now", return_value=self.now):
-                command._run_periodic_calendar_syncs()
+                self.command._run_periodic_calendar_syncs()
 
             # Verify no sync tasks were enqueued
             mock_enqueue.assert_not_called()
@@ -99,11 +106,9 @@ class RunSchedulerCommandTestCase(TestCase):
         just_under_30_minutes_ago = self.now - django_timezone.timedelta(minutes=29)
         calendar_just_under = Calendar.objects.create(project=self.project, platform=CalendarPlatform.MICROSOFT, state=CalendarStates.CONNECTED, sync_task_enqueued_at=just_under_30_minutes_ago, client_id="test_client_id_under")
 
-        command = Command()
-
         with patch("bots.tasks.sync_calendar_task.sync_calendar.delay") as mock_delay:
             with patch("django.utils.timezone.now", return_value=self.now):
-                command._run_periodic_calendar_syncs()
+                self.command._run_periodic_calendar_syncs()
 
             # Verify only the boundary calendar had a sync task enqueued
             mock_delay.assert_called_once_with(calendar_boundary.id)
@@ -122,11 +127,9 @@ class RunSchedulerCommandTestCase(TestCase):
         exactly_24_hours_ago = self.now - django_timezone.timedelta(hours=24)
         calendar_with_requested_sync = Calendar.objects.create(project=self.project, platform=CalendarPlatform.GOOGLE, state=CalendarStates.CONNECTED, sync_task_enqueued_at=exactly_five_minutes_ago, sync_task_requested_at=exactly_24_hours_ago, client_id="test_client_id_boundary")
 
-        command = Command()
-
         with patch("bots.tasks.sync_calendar_task.sync_calendar.delay") as mock_delay:
             with patch("django.utils.timezone.now", return_value=self.now):
-                command._run_periodic_calendar_syncs()
+                self.command._run_periodic_calendar_syncs()
 
             # Verify only the boundary calendar had a sync task enqueued
             mock_delay.assert_called_once_with(calendar_with_requested_sync.id)
@@ -167,11 +170,9 @@ class RunSchedulerCommandTestCase(TestCase):
             autopay_stripe_customer_id="cus_test789",
         )
 
-        command = Command()
-
         with patch("bots.tasks.autopay_charge_task.autopay_charge.delay") as mock_delay:
             with patch("django.utils.timezone.now", return_value=self.now):
-                command._run_autopay_tasks()
+                self.command._run_autopay_tasks()
 
             # Verify only the eligible organization had an autopay task enqueued
             mock_delay.assert_called_once_with(eligible_org.id)
@@ -200,11 +201,9 @@ class RunSchedulerCommandTestCase(TestCase):
             autopay_charge_task_enqueued_at=old_charge_time,
         )
 
-        command = Command()
-
         with patch("bots.tasks.autopay_charge_task.autopay_charge.delay") as mock_delay:
             with patch("django.utils.timezone.now", return_value=self.now):
-                command._run_autopay_tasks()
+                self.command._run_autopay_tasks()
 
             # Verify only the organization with old charge task had an autopay task enqueued
             mock_delay.assert_called_once_with(old_charge_org.id)
@@ -3,6 +3,7 @@ import hmac
 import json
 from unittest.mock import patch
 
+from django.db import transaction
 from django.test import Client, TestCase
 from django.urls import reverse
 
@@ -302,6 +303,79 @@ class TestZoomOAuthWebhooks(TestCase):
         self.assertIsNotNone(self.zoom_oauth_app.last_unverified_webhook_received_at)
         self.assertIsNone(self.zoom_oauth_app.last_verified_webhook_received_at)
 
+    def test_retried_signature_with_different_body_is_rejected(self):
+        """Test that a signature verified once can't be replayed with a different body."""
+        timestamp = "1234567890"
+        body = json.dumps({"event": "unknown.event.type", "payload": {}})
+        signature = self._generate_zoom_signature(body, timestamp, "test_webhook_secret")
+
+        for _ in range(2):
+            response = self.client.post(
+                self.url,
+                data=body,
+                content_type="application/json",
+                HTTP_X_ZM_SIGNATURE=signature,
+                HTTP_X_ZM_REQUEST_TIMESTAMP=timestamp,
+            )
+            self.assertEqual(response.status_code, 200)
+
+        tampered_body = json.dumps({"event": "unknown.event.type", "payload": {"tampered": True}})
+        response = self.client.post(
+            self.url,
+            data=tampered_body,
+            content_type="application/json",
+            HTTP_X_ZM_SIGNATURE=signature,
+            HTTP_X_ZM_REQUEST_TIMESTAMP=timestamp,
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_malformed_signature(self):
+        """Test webhook with a signature that is not a hex digest."""
+        event_data = {
+            "event": "meeting.created",
+            "payload": {
+                "object": {"id": "123456789", "host_id": "test_user_123"},
+                "operator_id": "test_user_123",
+            },
+        }
+        body = json.dumps(event_data)
+        timestamp = "1234567890"
+
+        response = self.client.post(
+            self.url,
+            data=body,
+            content_type="application/json",
+            HTTP_X_ZM_SIGNATURE="v0=not-a-hex-digest",
+            HTTP_X_ZM_REQUEST_TIMESTAMP=timestamp,
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(ZoomMeetingToZoomOAuthConnectionMapping.objects.filter(meeting_id="123456789").first())
+
+    def test_unsupported_signature_version(self):
+        """Test webhook with a valid digest under a signature version other than v0."""
+        event_data = {
+            "event": "meeting.created",
+            "payload": {
+                "object": {"id": "123456789", "host_id": "test_user_123"},
+                "operator_id": "test_user_123",
+            },
+        }
+        body = json.dumps(event_data)
+        timestamp = "1234567890"
+        signature = self._generate_zoom_signature(body, timestamp, "test_webhook_secret")
+
+        response = self.client.post(
+            self.url,
+            data=body,
+            content_type="application/json",
+            HTTP_X_ZM_SIGNATURE="v1=" + signature.removeprefix("v0="),
+            HTTP_X_ZM_REQUEST_TIMESTAMP=timestamp,
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(ZoomMeetingToZoomOAuthConnectionMapping.objects.filter(meeting_id="123456789").first())
+
     def test_nonexistent_zoom_oauth_app(self):
         """Test webhook for non-existent ZoomOAuthApp."""
         event_data = {
@@ -517,3 +591,56 @@ class TestZoomOAuthWebhooks(TestCase):
         self.zoom_oauth_app.refresh_from_db()
         self.assertIsNotNone(self.zoom_oauth_app.last_verified_webhook_received_at)
         self.assertIsNone(self.zoom_oauth_app.last_unverified_webhook_received_at)
+
+    def test_webhook_secret_change_invalidates_cached_zoom_oauth_app(self):
+        """Test that a cached ZoomOAuthApp is refreshed when its webhook secret changes."""
+        event_data = {"event": "unknown.event.type", "payload": {}}
+        body = json.dumps(event_data)
+        timestamp = "1234567890"
+
+        response = self.client.post(
+            self.url,
+            data=body,
+            content_type="application/json",
+            HTTP_X_ZM_SIGNATURE=self._generate_zoom_signature(body, timestamp, "test_webhook_secret"),
+            HTTP_X_ZM_REQUEST_TIMESTAMP=timestamp,
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # The cache entry is dropped once the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.zoom_oauth_app.set_credentials({"client_secret": "test_secret", "webhook_secret": "rotated_webhook_secret"})
+
+        response = self.client.post(
+            self.url,
+            data=body,
+            content_type="application/json",
+            HTTP_X_ZM_SIGNATURE=self._generate_zoom_signature(body, timestamp, "rotated_webhook_secret"),
+            HTTP_X_ZM_REQUEST_TIMESTAMP=timestamp,
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_zoom_oauth_app_cache_invalidated_only_after_commit(self):
+        """Test that saving a ZoomOAuthApp drops its cache entry only once the transaction commits."""
+        with patch("bots.zoom_oauth_connections_utils._delete_from_cache") as mock_delete_from_cache:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    self.zoom_oauth_app.save()
+                    mock_delete_from_cache.assert_not_called()
+
+                # The test case's own transaction hasn't committed yet either
+                mock_delete_from_cache.assert_not_called()
+
+            mock_delete_from_cache.assert_called_once_with(f"zoom_oauth_app:{self.zoom_oauth_app.object_id}")
+
+    def test_zoom_oauth_connection_cache_invalidated_only_after_commit(self):
+        """Test that deleting a ZoomOAuthConnection drops its cache entry only once the transaction commits."""
+        with patch("bots.zoom_oauth_connections_utils._delete_from_cache") as mock_delete_from_cache:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    self.zoom_oauth_connection.delete()
+                    mock_delete_from_cache.assert_not_called()
+
+                mock_delete_from_cache.assert_not_called()
+
+            mock_delete_from_cache.assert_called_once_with(f"zoom_oauth_connection:{self.zoom_oauth_app.id}:test_user_123")
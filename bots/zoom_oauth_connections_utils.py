@@ -1,13 +1,19 @@
 import hashlib
 import hmac
+import json
 import logging
+import os
+import threading
 
+import cachetools
+import redis
 import requests
-from django.db import transaction
+from blake3 import blake3
+from django.db import router, transaction
 from django.utils import timezone
 
 from bots.meeting_url_utils import parse_zoom_join_url
-from bots.models import Bot, WebhookTriggerTypes, ZoomMeetingToZoomOAuthConnectionMapping, ZoomOAuthConnection, ZoomOAuthConnectionStates
+from bots.models import Bot, WebhookTriggerTypes, ZoomMeetingToZoomOAuthConnectionMapping, ZoomOAuthApp, ZoomOAuthConnection, ZoomOAuthConnectionStates
 from bots.webhook_payloads import zoom_oauth_connection_webhook_payload
 from bots.webhook_utils import trigger_webhook
 
@@ -46,11 +52,40 @@ def client_id_and_secret_is_valid(client_id: str, client_secret: str) -> bool:
         return False
 
 
-def _verify_zoom_webhook_signature(body: str, timestamp: str, signature: str, secret: str):
+# Zoom retries webhook deliveries with the same body, timestamp and signature, so remember the ones we've
+# already verified. Only valid signatures are stored, so an attacker can't fill the cache.
+_verified_zoom_webhook_signatures = cachetools.TTLCache(maxsize=4096, ttl=600)
+_verified_zoom_webhook_signatures_lock = threading.Lock()
+
+
+def _zoom_webhook_signature_cache_key(body: bytes, timestamp: str, signature: str, secret: str) -> bytes:
+    # Keyed with the secret, so an entry can't be reused once the secret changes. BLAKE3 uses SIMD lanes, so large payloads hash much faster than with blake2b
+    body_digest = blake3(body, key=blake3(secret.encode("utf-8")).digest()).digest(16)
+    return body_digest + f"{timestamp}:{signature}".encode("utf-8")
+
+
+def _verify_zoom_webhook_signature(body: bytes, timestamp: str, signature: str, secret: str):
     """Verify the Zoom webhook signature."""
-    hmac_hash = hmac.new(secret.encode("utf-8"), f"v0:{timestamp}:{body}".encode("utf-8"), hashlib.sha256).hexdigest()
-    expected_signature = f"v0={hmac_hash}"
-    return expected_signature == signature
+    if not signature or not signature.startswith("v0="):
+        return False
+    try:
+        provided_digest = bytes.fromhex(signature[3:])
+    except ValueError:
+        return False
+
+    cache_key = _zoom_webhook_signature_cache_key(body, timestamp, signature, secret)
+    with _verified_zoom_webhook_signatures_lock:
+        if cache_key in _verified_zoom_webhook_signatures:
+            return True
+
+    # hmac.digest is the one-shot OpenSSL HMAC, so it uses the CPU's SHA extensions when available
+    expected_digest = hmac.digest(secret.encode("utf-8"), f"v0:{timestamp}:".encode("utf-8") + body, "sha256")
+    if not hmac.compare_digest(expected_digest, provided_digest):
+        return False
+
+    with _verified_zoom_webhook_signatures_lock:
+        _verified_zoom_webhook_signatures[cache_key] = True
+    return True
 
 
 def compute_zoom_webhook_validation_response(plain_token: str, secret_token: str) -> dict:
@@ -78,6 +113,115 @@ def compute_zoom_webhook_validation_response(plain_token: str, secret_token: str
     return {"plainToken": plain_token, "encryptedToken": encrypted_token}
 
 
+# The webhook endpoint only needs these fields, so they are all we cache. The webhook secret stays
+# Fernet-encrypted in the cache, the same as it is in the database.
+ZOOM_OAUTH_APP_CACHED_FIELDS = ("id", "object_id", "_encrypted_data")
+ZOOM_OAUTH_APP_CACHE_TTL_SECONDS = 300
+ZOOM_OAUTH_CONNECTION_CACHED_FIELDS = ("id", "object_id", "zoom_oauth_app_id", "user_id")
+ZOOM_OAUTH_CONNECTION_CACHE_TTL_SECONDS = 60
+
+_redis_client = None
+
+
+def _get_redis_client():
+    # Reuse one client (and its connection pool) per process instead of reconnecting on every lookup
+    global _redis_client
+    if _redis_client is None:
+        redis_url = os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
+        _redis_client = redis.from_url(redis_url)
+    return _redis_client
+
+
+def _zoom_oauth_app_cache_key(object_id: str) -> str:
+    return f"zoom_oauth_app:{object_id}"
+
+
+def _zoom_oauth_connection_cache_key(zoom_oauth_app_id: int, user_id: str) -> str:
+    return f"zoom_oauth_connection:{zoom_oauth_app_id}:{user_id}"
+
+
+def _serialize_model_fields_for_cache(instance, field_names) -> str:
+    data = {}
+    for field in instance._meta.concrete_fields:
+        if field.attname in field_names:
+            value = field.value_from_object(instance)
+            data[field.attname] = None if value is None else field.value_to_string(instance)
+    return json.dumps(data)
+
+
+def _deserialize_model_fields_from_cache(model_class, serialized: bytes):
+    """Rebuild a model instance from cached fields. Fields that were not cached are deferred and will be loaded from the database if accessed."""
+    data = json.loads(serialized)
+    field_names = []
+    values = []
+    for field in model_class._meta.concrete_fields:
+        if field.attname in data:
+            field_names.append(field.attname)
+            values.append(None if data[field.attname] is None else field.to_python(data[field.attname]))
+    return model_class.from_db(router.db_for_read(model_class), field_names, values)
+
+
+def _get_from_cache(cache_key: str):
+    try:
+        return _get_redis_client().get(cache_key)
+    except Exception as e:
+        logger.warning(f"Error reading {cache_key} from cache: {e}")
+        return None
+
+
+def _set_in_cache(cache_key: str, ttl_seconds: int, serialized: str):
+    try:
+        _get_redis_client().setex(cache_key, ttl_seconds, serialized)
+    except Exception as e:
+        logger.warning(f"Error writing {cache_key} to cache: {e}")
+
+
+def _delete_from_cache(cache_key: str):
+    try:
+        _get_redis_client().delete(cache_key)
+    except Exception as e:
+        logger.warning(f"Error deleting {cache_key} from cache: {e}")
+
+
+def get_cached_zoom_oauth_app(object_id: str) -> ZoomOAuthApp:
+    """
+    Get the ZoomOAuthApp with the given object_id, using a short-lived Redis cache so that bursts of
+    webhooks don't each need a database round trip. Raises ZoomOAuthApp.DoesNotExist if there is no such app.
+    """
+    cache_key = _zoom_oauth_app_cache_key(object_id)
+    cached_zoom_oauth_app = _get_from_cache(cache_key)
+    if cached_zoom_oauth_app:
+        return _deserialize_model_fields_from_cache(ZoomOAuthApp, cached_zoom_oauth_app)
+
+    # Only load the cached fields, so a cache miss returns the same (partially deferred) instance that a hit would
+    zoom_oauth_app = ZoomOAuthApp.objects.only(*ZOOM_OAUTH_APP_CACHED_FIELDS).get(object_id=object_id)
+    _set_in_cache(cache_key, ZOOM_OAUTH_APP_CACHE_TTL_SECONDS, _serialize_model_fields_for_cache(zoom_oauth_app, ZOOM_OAUTH_APP_CACHED_FIELDS))
+    return zoom_oauth_app
+
+
+def get_cached_zoom_oauth_connection(zoom_oauth_app: ZoomOAuthApp, user_id: str) -> ZoomOAuthConnection | None:
+    """Get the ZoomOAuthConnection for the given app and Zoom user id, or None if there isn't one. Uses the same cache as get_cached_zoom_oauth_app."""
+    cache_key = _zoom_oauth_connection_cache_key(zoom_oauth_app.id, user_id)
+    cached_zoom_oauth_connection = _get_from_cache(cache_key)
+    if cached_zoom_oauth_connection:
+        zoom_oauth_connection = _deserialize_model_fields_from_cache(ZoomOAuthConnection, cached_zoom_oauth_connection)
+        zoom_oauth_connection.zoom_oauth_app = zoom_oauth_app
+        return zoom_oauth_connection
+
+    zoom_oauth_connection = ZoomOAuthConnection.objects.filter(zoom_oauth_app=zoom_oauth_app, user_id=user_id).first()
+    if zoom_oauth_connection:
+        _set_in_cache(cache_key, ZOOM_OAUTH_CONNECTION_CACHE_TTL_SECONDS, _serialize_model_fields_for_cache(zoom_oauth_connection, ZOOM_OAUTH_CONNECTION_CACHED_FIELDS))
+    return zoom_oauth_connection
+
+
+def invalidate_cached_zoom_oauth_app(zoom_oauth_app: ZoomOAuthApp):
+    _delete_from_cache(_zoom_oauth_app_cache_key(zoom_oauth_app.object_id))
+
+
+def invalidate_cached_zoom_oauth_connection(zoom_oauth_connection: ZoomOAuthConnection):
+    _delete_from_cache(_zoom_oauth_connection_cache_key(zoom_oauth_connection.zoom_oauth_app_id, zoom_oauth_connection.user_id))
+
+
 def _raise_if_error_is_authentication_error(e: requests.RequestException):
     error_code = e.response.json().get("error")
     if error_code == "invalid_grant" or error_code == "invalid_client":